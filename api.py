@@ -0,0 +1,179 @@
+import datetime
+import hashlib
+from flask import Blueprint, current_app, request, Response, jsonify
+from models import db, Venue, Artist, Show, Genre, table_version
+from venues import venue_page_data
+from artists import artist_page_data
+from shows import show_tile_details
+
+bp = Blueprint('api', __name__)
+
+#  API
+#  ----------------------------------------------------------------
+
+def api_json(data):
+  # JSON ready copy of a page data structure, with datetimes in ISO format
+  # and without the template-only fragment cache keys
+  if isinstance(data, dict):
+    return {key: api_json(value) for key, value in data.items() if key != 'fragment_key'}
+  if isinstance(data, list):
+    return [api_json(value) for value in data]
+  if isinstance(data, datetime.datetime):
+    return data.isoformat()
+  return data
+
+def sparse_fields(data):
+  # Keep only the top level fields asked for with ?fields=a,b
+  fields = request.args.get('fields')
+  if not fields:
+    return data
+  wanted = {field.strip() for field in fields.split(',')}
+  return {key: value for key, value in data.items() if key in wanted}
+
+def conditional_json(version, build):
+  # The ETag covers the request arguments and the row versions the body is
+  # built from. When the client already has it, answer 304 without building
+  # or serializing the body at all
+  etag = hashlib.sha1(repr((
+    request.path, sorted(request.args.items(multi=True)), tuple(version)
+  )).encode()).hexdigest()
+  if request.if_none_match.contains(etag):
+    response = Response(status=304)
+  else:
+    response = jsonify(build())
+  response.set_etag(etag)
+  response.cache_control.no_cache = True
+  return response
+
+def api_not_found():
+  return jsonify({'error': 'Not found'}), 404
+
+def api_page_window():
+  limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+  limit = max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+  offset = max(0, request.args.get('offset', 0, type=int))
+  return limit, offset
+
+def next_show_start(*criteria):
+  # Start of the next upcoming show matching the criteria, an index seek.
+  # Shows move from upcoming to past without any write, and this changes
+  # whenever one does
+  current_date_time = datetime.datetime.now()
+  return db.session.query(db.func.min(Show.start_time)).filter(
+           Show.start_time>=current_date_time, *criteria).scalar()
+
+def api_listing_collection(model):
+  limit, offset = api_page_window()
+
+  def build():
+    entities = model.query.options(db.selectinload(model.genres)).order_by(
+                 model.id).offset(offset).limit(limit).all()
+    return {
+      'data': [api_json(sparse_fields({
+        'id': entity.id,
+        'name': entity.name,
+        'city': entity.city,
+        'state': entity.state,
+        'genres': [genre.name for genre in entity.genres],
+        'image_link': entity.image_link,
+        'upcoming_show_count': entity.upcoming_show_count,
+        'next_show_at': entity.next_show_at
+      })) for entity in entities],
+      'limit': limit,
+      'offset': offset
+    }
+
+  # The counters in the listing move forward with flask roll-forward-shows,
+  # which stamps the rows like any other write. Genres are listed by name
+  return conditional_json(table_version(model) + table_version(Genre), build)
+
+def api_listing_detail(model, entity_id, page_data):
+  # The row version covers changes to the row and its shows. The page also
+  # shows each show's artist or venue, so add up their versions, which only
+  # grow, and take the start of the next show for shows moving into the
+  # past. Both come from one pass over the row's shows. Reads never write
+  version = db.session.query(model.version).filter(model.id==entity_id).scalar()
+  if version is None:
+    return api_not_found()
+  if model is Venue:
+    foreign_key, counterpart, counterpart_key = Show.venue_id, Artist, Show.artist_id
+  else:
+    foreign_key, counterpart, counterpart_key = Show.artist_id, Venue, Show.venue_id
+  current_date_time = datetime.datetime.now()
+  counterparts, next_show = db.session.query(
+    db.func.coalesce(db.func.sum(counterpart.version), 0),
+    db.func.min(db.case((Show.start_time>=current_date_time, Show.start_time)))
+  ).select_from(Show).join(counterpart, counterpart.id==counterpart_key).filter(
+    foreign_key==entity_id).one()
+
+  def build():
+    entity = model.query.options(db.joinedload(model.genres)).get(entity_id)
+    return api_json(sparse_fields(page_data(entity)))
+
+  return conditional_json((version, counterparts, next_show), build)
+
+@bp.route('/api/v1/venues')
+def api_venues():
+  return api_listing_collection(Venue)
+
+@bp.route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+  return api_listing_detail(Venue, venue_id, venue_page_data)
+
+@bp.route('/api/v1/artists')
+def api_artists():
+  return api_listing_collection(Artist)
+
+@bp.route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+  return api_listing_detail(Artist, artist_id, artist_page_data)
+
+def api_show_data(show):
+  data = show_tile_details(show)
+  data.update({
+    'id': show.id,
+    'venue_image_link': show.venue.image_link
+  })
+  return api_json(sparse_fields(data))
+
+@bp.route('/api/v1/shows')
+def api_shows():
+  # Same scopes as /shows. Show tiles carry their venue's and artist's
+  # details, so the version covers all three, and the start of the next
+  # show covers shows moving from one scope into the other
+  limit, offset = api_page_window()
+  scope = request.args.get('scope', 'upcoming')
+  current_date_time = datetime.datetime.now()
+  query = Show.query
+  if scope == 'upcoming':
+    query = query.filter(Show.start_time>=current_date_time)
+  elif scope == 'past':
+    query = query.filter(Show.start_time<current_date_time)
+
+  def build():
+    page_shows = query.options(db.joinedload(Show.venue), db.joinedload(Show.artist)).order_by(
+                   Show.start_time, Show.id).offset(offset).limit(limit).all()
+    return {
+      'data': [api_show_data(show) for show in page_shows],
+      'limit': limit,
+      'offset': offset
+    }
+
+  version = table_version(Show) + table_version(Venue) + table_version(Artist)
+  if scope in ('upcoming', 'past'):
+    version += (next_show_start(),)
+  return conditional_json(version, build)
+
+@bp.route('/api/v1/shows/<int:show_id>')
+def api_show(show_id):
+  row = db.session.query(Show.version, Venue.version, Artist.version).join(
+          Venue, Show.venue_id==Venue.id).join(
+          Artist, Show.artist_id==Artist.id).filter(Show.id==show_id).first()
+  if row is None:
+    return api_not_found()
+
+  def build():
+    show = Show.query.options(db.joinedload(Show.venue), db.joinedload(Show.artist)).get(show_id)
+    return api_show_data(show)
+
+  return conditional_json(tuple(row), build)
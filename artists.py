@@ -0,0 +1,203 @@
+import sys
+from flask import Blueprint, current_app, render_template, stream_template, request, flash, redirect, url_for
+from models import db, Artist, Show, artist_genres, add_genres, query_past_upcoming_shows
+from services import (search_backend, suggest_index, cached_page, page_cache, page_path,
+                      fragment_key, stream_requested)
+
+bp = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+@bp.route('/artists')
+@cached_page
+def artists():
+  # In streaming mode read the artists through a server-side cursor and
+  # render them as they arrive instead of building the whole list first
+  if stream_requested():
+    artist_rows = db.session.query(Artist.id, Artist.name).order_by(Artist.id).yield_per(
+                    current_app.config['STREAM_CHUNK_SIZE'])
+    data = ({'id': artist.id, 'name': artist.name} for artist in artist_rows)
+    return stream_template('pages/artists.html', artists=data)
+
+  # Get all the artist records from the database
+  all_artists = Artist.query.all()
+
+  # Initialize the data list for artist details dictionary
+  data = []
+  # Loop through each artist, get details and append to data list
+  for artist in all_artists:
+    artist_details = {
+      'id': artist.id,
+      'name': artist.name
+    }
+    data.append(artist_details)
+
+  return render_template('pages/artists.html', artists=data)
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+  # Get search term and run it through the search backend, which matches
+  # name, city, state and genre and returns results ranked best first
+  search_term = request.form.get('search_term', '')
+  count_of_results, search_results = search_backend().search(Artist, search_term)
+  
+  # Initialize the data list and step through each result to retrieve needed data
+  data = []
+  for artist in search_results:
+    artist_details = {
+      'id': artist.id,
+      'name': artist.name,
+      'num_upcoming_shows': artist.upcoming_show_count
+    }
+    data.append(artist_details)
+  
+  # Build the response dictionary the view is expecting
+  response = {
+    'count': count_of_results,
+    'data': data
+  }
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/artists/<int:artist_id>')
+@cached_page
+def show_artist(artist_id):
+  # Query db for artist with its genres loaded alongside it
+  artist_details = Artist.query.options(db.joinedload(Artist.genres)).get(artist_id)
+  
+  # If the artist provided to the endpoint does not exist, return to artist list
+  if not artist_details:
+    return redirect(url_for('.artists'))
+
+  return render_template('pages/show_artist.html', artist=artist_page_data(artist_details))
+
+def artist_page_data(artist_details):
+  artist_id = artist_details.id
+
+  # Construct past/future shows details, with each show's venue loaded in
+  # the same query
+  past_shows = []
+  upcoming_shows = []
+  for shows_list, shows in zip((past_shows, upcoming_shows),
+                               query_past_upcoming_shows(Show.artist_id, artist_id, Show.venue)):
+    for show in shows:
+      shows_list.append({
+        'venue_id': show.venue_id,
+        'venue_name': show.venue.name,
+        'venue_image_link': show.venue.image_link,
+        'venue_image_key': show.venue.image_key,
+        'start_time': show.start_time,
+        'fragment_key': fragment_key(show.id, show.version, show.venue.version)
+      })
+
+  # Get genre list for artist
+  genre_list = []
+  for genre in artist_details.genres:
+    genre_list.append(genre.name)
+
+  # Construct data dictionary expected by view
+  data = {
+    'id': artist_details.id,
+    'name': artist_details.name,
+    'genres': genre_list,
+    'city': artist_details.city,
+    'state': artist_details.state,
+    'phone': artist_details.phone,
+    'website': artist_details.website,
+    'facebook_link': artist_details.facebook_link,
+    'seeking_talent': artist_details.seeking_venue,
+    'seeking_description': artist_details.seeking_description,
+    'image_link': artist_details.image_link,
+    'image_key': artist_details.image_key,
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': len(past_shows),
+    'upcoming_shows_count': len(upcoming_shows)
+  }
+
+  return data
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  artist={
+    "id": 4,
+    "name": "Guns N Petals",
+    "genres": ["Rock n Roll"],
+    "city": "San Francisco",
+    "state": "CA",
+    "phone": "326-123-5000",
+    "website": "https://www.gunsnpetalsband.com",
+    "facebook_link": "https://www.facebook.com/GunsNPetals",
+    "seeking_venue": True,
+    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+  }
+  # TODO: populate form with fields from artist with ID <artist_id>
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  # TODO: take values from the form submitted, and update existing
+  # artist record with ID <artist_id> using the new attributes
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  try:
+    name = request.form.get('name')
+    city = request.form.get('city')
+    state = request.form.get('state')
+    phone = request.form.get('phone')
+    seeking_venue = request.form.get('seeking_venue')
+    seeking_description = request.form.get('seeking_description')
+    image_link = request.form.get('image_link')
+    website = request.form.get('website')
+    facebook_link = request.form.get('facebook_link')
+    
+    if seeking_venue == 'y':
+      seeking_venue = True
+    elif seeking_venue == 'n':
+      seeking_venue = False
+
+    new_artist = Artist(
+      name=name,
+      city=city,
+      state=state,
+      phone=phone,
+      seeking_venue=seeking_venue,
+      seeking_description=seeking_description,
+      image_link=image_link,
+      website=website,
+      facebook_link=facebook_link
+    )
+
+    db.session.add(new_artist)
+    db.session.flush()
+    add_genres(artist_genres, 'artist_id', new_artist.id, request.form.getlist('genres'))
+    search_backend().index(new_artist)
+    db.session.commit()
+    suggest_index().add('artist', new_artist.id, new_artist.name)
+    page_cache().invalidate(page_path('artists.artists'))
+    flash(f'Artist {name} was successfully listed!')
+  except:
+    db.session.rollback()
+    flash(f'Artist {name} could not be listed.')
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
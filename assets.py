@@ -0,0 +1,256 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+
+MANIFEST = 'manifest.json'
+
+# Encodings served by content negotiation, most preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Built files worth compressing: text formats and the uncompressed font
+# formats. Images and woff fonts are compressed already
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.ttf', '.eot', '.otf', '.txt')
+MIN_COMPRESS_SIZE = 1024
+
+# Comments other than /*! license */ comments, and the url() references
+# whose targets get fingerprinted
+_CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(text):
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(' ', text)
+    text = _CSS_PUNCTUATION.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Scripts are only minified with the optional rjsmin package; without it
+    # they are bundled as they are, which costs little as the libraries ship
+    # minified
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+def fingerprint(name, data):
+    """Return name with a hash of data before its extension."""
+    base, extension = posixpath.splitext(name)
+    return f'{base}.{hashlib.sha1(data).hexdigest()[:12]}{extension}'
+
+
+def source_files(static_folder, build_dir):
+    """Return the path of every source asset relative to static_folder,
+    leaving out the build directory and dotfiles."""
+    names = []
+    for root, dirs, files in os.walk(static_folder):
+        relative = os.path.relpath(root, static_folder)
+        if relative == build_dir:
+            dirs[:] = []
+            continue
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for filename in files:
+            if not filename.startswith('.'):
+                names.append(posixpath.normpath(posixpath.join(relative.replace(os.sep, '/'), filename)))
+    return sorted(names)
+
+
+def sources_digest(static_folder, names):
+    # Digest of every source asset, recorded in the manifest so a build of
+    # other sources is never served
+    digest = hashlib.sha1()
+    for name in names:
+        with open(os.path.join(static_folder, name), 'rb') as source:
+            digest.update(name.encode() + b'\0' + source.read() + b'\0')
+    return digest.hexdigest()
+
+
+def _rewrite_css_urls(text, source, target, files):
+    # Point the url() references of source, a CSS file moving to target, at
+    # the fingerprinted copies, or at the original files when not built
+    def replace(match):
+        quote, reference = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', reference):
+            return match.group(0)
+        path, hash_mark, fragment = reference.partition('#')
+        path, query_mark, query = path.partition('?')
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        resolved = files.get(resolved, resolved)
+        relative = posixpath.relpath(resolved, posixpath.dirname(target))
+        return f'url({quote}{relative}{query_mark}{query}{hash_mark}{fragment}{quote})'
+    return _CSS_URL.sub(replace, text)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as built:
+        built.write(data)
+    os.replace(temporary, path)
+
+
+def _compress(path, data):
+    # Write the encodings that come out smaller, and return their names
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    encoders = {
+        'br': (lambda data: brotli.compress(data, quality=11)) if brotli else None,
+        'gzip': lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    }
+    encodings = []
+    for encoding, suffix in ENCODINGS:
+        encoder = encoders[encoding]
+        if encoder is None:
+            continue
+        compressed = encoder(data)
+        if len(compressed) < len(data):
+            _write(path + suffix, compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build_assets(app):
+    """Build the static assets of app into ASSET_BUILD_DIR under its static
+    folder and write the manifest mapping each asset to its build.
+
+    Every bundle in ASSET_BUNDLES is concatenated from its sources and
+    minified, and every other file is copied as is. Each built file gets a
+    content hash in its name, and compressible files get gzip and, with the
+    optional brotli package, brotli variants. Builds of earlier versions
+    are left in place for pages still cached with their URLs. Returns the
+    manifest.
+    """
+    static_folder = app.static_folder
+    build_dir = app.config['ASSET_BUILD_DIR']
+    bundles = app.config['ASSET_BUNDLES']
+    names = source_files(static_folder, build_dir)
+
+    files = {}
+    compressed = {}
+
+    def emit(name, data):
+        built = posixpath.join(build_dir, fingerprint(name, data))
+        path = os.path.join(static_folder, built)
+        if not os.path.exists(path):
+            _write(path, data)
+        if name.endswith(COMPRESSIBLE) and len(data) >= MIN_COMPRESS_SIZE:
+            encodings = _compress(path, data)
+            if encodings:
+                compressed[built] = encodings
+        files[name] = built
+
+    def read(name):
+        with open(os.path.join(static_folder, name), 'rb') as source:
+            return source.read()
+
+    # Stylesheets last, so the files they reference are built first
+    for name in sorted(names, key=lambda name: name.endswith('.css')):
+        data = read(name)
+        if name.endswith('.css'):
+            target = posixpath.join(build_dir, name)
+            data = _rewrite_css_urls(data.decode('utf-8'), name, target, files).encode('utf-8')
+        emit(name, data)
+
+    for bundle, sources in bundles.items():
+        target = posixpath.join(build_dir, bundle)
+        parts = []
+        for source in sources:
+            text = read(source).decode('utf-8')
+            if bundle.endswith('.css'):
+                parts.append(minify_css(_rewrite_css_urls(text, source, target, files)))
+            else:
+                parts.append(minify_js(text).rstrip().rstrip(';') + ';')
+        emit(bundle, '\n'.join(parts).encode('utf-8'))
+
+    manifest = {
+        'digest': sources_digest(static_folder, names),
+        'files': files,
+        'compressed': compressed,
+    }
+    _write(os.path.join(static_folder, build_dir, MANIFEST),
+           json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(app):
+    """Return the manifest of the current build, or None when there is no
+    build or it was built from other sources."""
+    static_folder = app.static_folder
+    build_dir = app.config['ASSET_BUILD_DIR']
+    try:
+        with open(os.path.join(static_folder, build_dir, MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('digest') != sources_digest(static_folder, source_files(static_folder, build_dir)):
+        app.logger.warning('Static asset build is out of date, serving the sources instead')
+        return None
+    return manifest
+
+
+def asset_url(name):
+    """URL of the static file name, fingerprinted when it is built."""
+    manifest = current_app.extensions['assets']
+    return url_for('static', filename=manifest['files'].get(name, name))
+
+
+def asset_urls(name):
+    """URLs to load the bundle or static file name with: the built bundle
+    when there is a build, and otherwise each of its sources."""
+    manifest = current_app.extensions['assets']
+    if name not in manifest['files'] and name in current_app.config['ASSET_BUNDLES']:
+        return [asset_url(source) for source in current_app.config['ASSET_BUNDLES'][name]]
+    return [asset_url(name)]
+
+
+def send_static_file(filename):
+    # Serve a static file, choosing a precompressed variant by the client's
+    # Accept-Encoding. Built files never change under their name, so they
+    # are cached for ASSET_MAX_AGE as immutable
+    app = current_app
+    config = app.config
+    immutable = filename.startswith(config['ASSET_BUILD_DIR'] + '/')
+    max_age = config['ASSET_MAX_AGE'] if immutable else None
+    encodings = app.extensions['assets']['compressed'].get(filename, ())
+
+    response = None
+    for encoding, suffix in ENCODINGS:
+        if encoding in encodings and request.accept_encodings[encoding]:
+            response = send_from_directory(app.static_folder, filename + suffix, max_age=max_age,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(app.static_folder, filename, max_age=max_age)
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """Serve app's static files through send_static_file and give its
+    templates asset_url() and asset_urls(). Outside debug mode the current
+    build is used when there is one."""
+    manifest = None
+    if app.config['ASSET_BUILD_ENABLED']:
+        manifest = load_manifest(app)
+    app.extensions['assets'] = manifest or {'files': {}, 'compressed': {}}
+    app.add_template_global(asset_url)
+    app.add_template_global(asset_urls)
+    app.view_functions['static'] = send_static_file
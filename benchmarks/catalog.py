@@ -0,0 +1,173 @@
+"""Synthetic catalog generator for the benchmarks.
+
+Fills a database with venues spread across cities and states, artists,
+genres and shows spread across the past and the future, written with bulk
+inserts so catalogs of a few hundred thousand shows load in seconds. The
+same seed always produces the same catalog. Run from the repository root
+to load a database on its own:
+
+    python benchmarks/catalog.py --database sqlite:///bench.sqlite --shows 50000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from genres import GENRE_ORDER  # noqa: E402
+
+STATES = ['CA', 'CO', 'FL', 'GA', 'IL', 'LA', 'MA', 'MN', 'NY', 'OR', 'TN', 'TX', 'WA']
+
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Rusty', 'Silver', 'Midnight', 'Wild',
+              'Crimson', 'Hollow', 'Lucky', 'Neon', 'Quiet', 'Paper', 'Broken', 'Iron']
+
+VENUE_NOUNS = ['Room', 'Hall', 'Lounge', 'Tavern', 'Theatre', 'Club', 'Garden', 'Loft',
+               'Ballroom', 'Cellar', 'Barn', 'Stage']
+
+ARTIST_NOUNS = ['Wolves', 'Saints', 'Echoes', 'Rivers', 'Machines', 'Ghosts', 'Owls',
+                'Brothers', 'Sisters', 'Quartet', 'Collective', 'Orchestra']
+
+SIZES = {
+    'cities': 50,
+    'venues': 500,
+    'artists': 2000,
+    'shows': 20000,
+}
+
+CHUNK_SIZE = 5000
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _insert(db, table, rows):
+    for chunk in _chunks(rows):
+        db.session.execute(table.insert(), chunk)
+
+
+def _listing(rng, index, nouns, area):
+    city, state = area
+    name = f'The {rng.choice(ADJECTIVES)} {rng.choice(nouns)} {index}'
+    slug = name.lower().replace(' ', '-')
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+        'website': f'https://www.{slug}.example',
+        'image_link': f'https://images.example/{slug}.jpg',
+        'facebook_link': f'https://www.facebook.com/{slug}',
+        'seeking_description': 'Looking for new collaborators.',
+    }
+
+
+def generate(db, cities=SIZES['cities'], venues=SIZES['venues'], artists=SIZES['artists'],
+             shows=SIZES['shows'], seed=0, now=None):
+    """Load a catalog of the given size into the app's database, which
+    should hold no venues, artists or shows yet. Needs an app context."""
+    from models import Genre, Venue, Artist, Show, venue_genres, artist_genres, refresh_show_counters
+    from services import search_backend
+
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now()
+    areas = [(f'{rng.choice(ADJECTIVES)}ville {index}', rng.choice(STATES)) for index in range(cities)]
+
+    existing = {name for name, in db.session.query(Genre.name)}
+    _insert(db, Genre.__table__, [{'name': name} for name in GENRE_ORDER if name not in existing])
+    genre_ids = [genre_id for genre_id, in db.session.query(Genre.id)]
+
+    # Ids are read back in insert order, so they line up however the
+    # database hands them out
+    venue_rows = []
+    for index in range(venues):
+        row = _listing(rng, index, VENUE_NOUNS, rng.choice(areas))
+        row.update({
+            'address': f'{rng.randint(1, 9999)} {rng.choice(ADJECTIVES)} Street',
+            'seeking_talent': rng.random() < 0.3,
+        })
+        venue_rows.append(row)
+    _insert(db, Venue.__table__, venue_rows)
+    venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).order_by(Venue.id)]
+
+    artist_rows = []
+    for index in range(artists):
+        row = _listing(rng, index, ARTIST_NOUNS, rng.choice(areas))
+        row['seeking_venue'] = rng.random() < 0.3
+        artist_rows.append(row)
+    _insert(db, Artist.__table__, artist_rows)
+    artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).order_by(Artist.id)]
+
+    for association, owner_column, owner_ids in ((venue_genres, 'venue_id', venue_ids),
+                                                 (artist_genres, 'artist_id', artist_ids)):
+        _insert(db, association, (
+            {owner_column: owner_id, 'genre_id': genre_id}
+            for owner_id in owner_ids
+            for genre_id in rng.sample(genre_ids, rng.randint(1, 3))
+        ))
+
+    # Start times spread over a year either side of now, on the hour
+    def start_time():
+        offset = datetime.timedelta(hours=rng.randint(-365 * 24, 365 * 24))
+        return (now + offset).replace(minute=0, second=0, microsecond=0)
+
+    if venue_ids and artist_ids:
+        _insert(db, Show.__table__, (
+            {'venue_id': rng.choice(venue_ids), 'artist_id': rng.choice(artist_ids), 'start_time': start_time()}
+            for _ in range(shows)
+        ))
+
+    refresh_show_counters(Venue)
+    refresh_show_counters(Artist)
+    db.session.commit()
+
+    backend = search_backend()
+    backend.rebuild(Venue)
+    backend.rebuild(Artist)
+
+
+def catalog_size(db):
+    """Return the number of venues, artists and shows in the database."""
+    from models import Venue, Artist, Show
+
+    return {
+        'venues': db.session.query(Venue).count(),
+        'artists': db.session.query(Artist).count(),
+        'shows': db.session.query(Show).count(),
+    }
+
+
+def add_size_arguments(parser):
+    for name, default in SIZES.items():
+        parser.add_argument(f'--{name}', type=int, default=default, help=f'number of {name} (default {default})')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLAlchemy database URI')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+    with app.app_context():
+        db.create_all()
+        if any(catalog_size(db).values()):
+            sys.exit('The database already holds a catalog')
+        generate(db, args.cities, args.venues, args.artists, args.shows, args.seed)
+        print(catalog_size(db))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Micro-benchmark for the datetime filter.
+
+Compares the old pipeline, which parsed a string with dateutil and formatted
+it with babel on every call, against formatting.format_datetime on native
+datetimes. Run from the repository root:
+
+    python benchmarks/format_datetime.py
+"""
+import datetime
+import os
+import sys
+import timeit
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from formatting import DATETIME_FORMATS, compiled_pattern, format_datetime  # noqa: E402
+
+NUMBER = 20000
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format))
+
+
+def main():
+    # A page's worth of shows, repeated the way the listings repeat them
+    start = datetime.datetime(2020, 5, 21, 20, 0)
+    times = [start + datetime.timedelta(hours=6 * i) for i in range(30)]
+    strings = [str(value) for value in times]
+
+    cases = [
+        ('legacy, str -> parse -> babel', lambda: [legacy_format_datetime(value, 'full') for value in strings]),
+        ('legacy, rendered twice', lambda: [legacy_format_datetime(legacy_format_datetime(value), 'full') for value in strings]),
+        ('compiled pattern, no memo', lambda: [
+            compiled_pattern('full', babel.dates.LC_TIME)[0].apply(value, babel.dates.LC_TIME) for value in times
+        ]),
+        ('cached, datetime', lambda: [format_datetime(value, 'full') for value in times]),
+    ]
+    calls = NUMBER // len(times)
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=calls, repeat=3))
+        print(f'{name:32} {seconds / (calls * len(times)) * 1e6:8.2f} us/call')
+
+
+if __name__ == '__main__':
+    main()
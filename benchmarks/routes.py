@@ -0,0 +1,205 @@
+"""Route benchmarks through the Flask test client.
+
+Generates a synthetic catalog (see catalog.py) into the database given with
+--database, then times every page, both search endpoints and the create
+handlers. Each route reports latency percentiles and its statement count,
+and the full results go to a JSON file that --compare can diff against a
+run from another commit. Run from the repository root:
+
+    python benchmarks/routes.py --output before.json
+    python benchmarks/routes.py --output after.json --compare before.json
+
+The default database is a fresh SQLite file in a temporary directory. An
+existing database that already holds a catalog is reused as is. The page
+and fragment caches are off unless --cache is given, so every request
+measures the real page build.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from catalog import add_size_arguments, catalog_size, generate  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of sorted samples
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def routes(venue_id, artist_id):
+    """(name, method, url, data factory, expected) for every benchmarked
+    route. The factories get the request number so created records stay
+    unique. expected, when set, is a pattern the response body must match,
+    so a route timed doing no real work is caught."""
+    start_time = (datetime.datetime.now() + datetime.timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        ('home', 'GET', '/', None, None),
+        ('venues', 'GET', '/venues', None, None),
+        ('artists', 'GET', '/artists', None, None),
+        ('shows', 'GET', '/shows', None, None),
+        ('shows past', 'GET', '/shows?scope=past', None, None),
+        ('venue detail', 'GET', f'/venues/{venue_id}', None, None),
+        ('artist detail', 'GET', f'/artists/{artist_id}', None, None),
+        ('search venues', 'POST', '/venues/search', lambda n: {'search_term': 'golden'}, None),
+        ('search artists', 'POST', '/artists/search', lambda n: {'search_term': 'wolves'}, None),
+        ('search shows', 'GET', '/search?q=jazz', None,
+         r'Venues matching "jazz": [1-9][\s\S]*Artists matching "jazz": [1-9]'),
+        ('create venue', 'POST', '/venues/create', lambda n: {
+            'name': f'Benchmark Venue {n}', 'city': 'Benchmark City', 'state': 'CA',
+            'address': '1 Main Street', 'phone': '555-555-5555', 'genres': ['Jazz', 'Blues'],
+        }, None),
+        ('create artist', 'POST', '/artists/create', lambda n: {
+            'name': f'Benchmark Artist {n}', 'city': 'Benchmark City', 'state': 'CA',
+            'phone': '555-555-5555', 'genres': ['Folk'],
+        }, None),
+        ('create show', 'POST', '/shows/create', lambda n: {
+            'venue_id': venue_id, 'artist_id': artist_id, 'start_time': start_time,
+        }, None),
+    ]
+
+
+def time_route(client, method, url, data, expected, requests, warmup):
+    from querystats import count_queries
+
+    counter = itertools.count()
+    latencies = []
+    queries = []
+    statuses = set()
+    for iteration in range(warmup + requests):
+        kwargs = {'data': data(next(counter))} if data else {}
+        with count_queries(call_sites=False) as stats:
+            started = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            body = response.get_data(as_text=True)
+            elapsed = time.perf_counter() - started
+        if iteration == 0 and expected and not re.search(expected, body):
+            sys.exit(f'{method} {url} did not return the expected results ({expected})')
+        if iteration >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(stats.count)
+            statuses.add(response.status_code)
+
+    latencies.sort()
+    return {
+        'method': method,
+        'url': url,
+        'requests': requests,
+        'status': sorted(statuses),
+        'queries': statistics.median(queries),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p90_ms': round(percentile(latencies, 0.90), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    print(f'\n{"route":16} {"p50 before":>11} {"p50 after":>10} {"change":>8} {"queries":>9}')
+    for name, after in results['routes'].items():
+        before = baseline['routes'].get(name)
+        if before is None:
+            continue
+        change = (after['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f'{name:16} {before["p50_ms"]:11.2f} {after["p50_ms"]:10.2f} {change:+7.1f}% '
+              f'{before["queries"]:>4g}->{after["queries"]:<4g}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help='SQLAlchemy database URI (default: a temporary SQLite file)')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route first')
+    parser.add_argument('--cache', action='store_true', help='leave the page and fragment caches on')
+    parser.add_argument('--output', default='benchmark-results.json', help='results file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    add_size_arguments(parser)
+    args = parser.parse_args()
+
+    workdir = None
+    if args.database is None:
+        workdir = tempfile.TemporaryDirectory()
+        args.database = 'sqlite:///' + os.path.join(workdir.name, 'benchmark.sqlite')
+    from app import create_app
+    from models import db, Venue, Artist
+
+    # Testing mode keeps the error log out of it; statements are counted
+    # here, so the app's own per-request stats are off
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database,
+        'DEBUG': False,
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'QUERY_STATS_ENABLED': False,
+        'PAGE_CACHE_ENABLED': args.cache,
+        'FRAGMENT_CACHE_ENABLED': args.cache,
+    })
+
+    with app.app_context():
+        db.create_all()
+        if not any(catalog_size(db).values()):
+            started = time.perf_counter()
+            generate(db, args.cities, args.venues, args.artists, args.shows, args.seed)
+            print(f'Generated catalog in {time.perf_counter() - started:.1f}s')
+        size = catalog_size(db)
+        # The busiest venue and artist, so detail pages have shows to render
+        venue_id, = db.session.query(Venue.id).order_by(Venue.upcoming_show_count.desc(), Venue.id).first()
+        artist_id, = db.session.query(Artist.id).order_by(Artist.upcoming_show_count.desc(), Artist.id).first()
+        dialect = db.engine.dialect.name
+    print(f'Catalog on {dialect}: {size}')
+
+    results = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': dialect,
+        'catalog': size,
+        'requests': args.requests,
+        'cache': args.cache,
+        'routes': {},
+    }
+    client = app.test_client()
+    print(f'\n{"route":16} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"max ms":>8} {"queries":>8}')
+    for name, method, url, data, expected in routes(venue_id, artist_id):
+        timing = time_route(client, method, url, data, expected, args.requests, args.warmup)
+        results['routes'][name] = timing
+        print(f'{name:16} {timing["p50_ms"]:8.2f} {timing["p90_ms"]:8.2f} {timing["p99_ms"]:8.2f} '
+              f'{timing["max_ms"]:8.2f} {timing["queries"]:8g}')
+
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+    if workdir is not None:
+        with app.app_context():
+            db.engine.dispose()
+        workdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
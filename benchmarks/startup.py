@@ -0,0 +1,154 @@
+"""Worker startup benchmark.
+
+Times how long a fresh interpreter takes to import the app module and build
+the app with create_app(), which is what every new worker pays before it
+serves its first request. Each run is a separate process started with
+python -X importtime, and the slowest top-level imports are listed so a
+regression can be traced to the dependency that caused it. Run from the
+repository root:
+
+    python benchmarks/startup.py --output before.json
+    python benchmarks/startup.py --output after.json --compare before.json
+    python benchmarks/startup.py --max-ms 400
+
+--max-ms exits non-zero when the median startup is slower, for use in CI.
+The app is built with FYYUR_ENV=testing unless the environment sets it, so
+no database server is needed.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from routes import ROOT, git_commit, percentile  # noqa: E402
+
+# Run in the child: the wall time of the import and of the factory
+CHILD = '''
+import json, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+built = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'create_ms': (built - imported) * 1000}))
+'''
+
+# "import time:  self [us] | cumulative | imported package", with two more
+# spaces before the package name for every level of nesting
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+def top_level_imports(stderr):
+    """Return {module: cumulative ms} for the modules imported by the app
+    module itself and for those imported later, while building the app."""
+    modules = {}
+    nested = {}
+    # Each import is printed after everything it imported in turn
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if not match:
+            continue
+        depth, module = len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            nested[module] = int(match.group(2)) / 1000
+        elif depth == 0:
+            if module == 'app':
+                modules.update(nested)
+            else:
+                modules[module] = int(match.group(2)) / 1000
+            nested = {}
+    return modules
+
+
+def run_once(env):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f'Building the app failed:\n{result.stderr[-2000:]}')
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    return timing, top_level_imports(result.stderr)
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p90_ms': round(percentile(samples, 0.90), 3),
+        'min_ms': round(samples[0], 3),
+        'max_ms': round(samples[-1], 3),
+    }
+
+
+def compare(results, baseline):
+    print(f'\n{"phase":8} {"p50 before":>11} {"p50 after":>10} {"change":>8}')
+    for phase in ('import', 'create', 'total'):
+        before, after = baseline[phase]['p50_ms'], results[phase]['p50_ms']
+        change = (after - before) / before * 100 if before else 0.0
+        print(f'{phase:8} {before:11.2f} {after:10.2f} {change:+7.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='processes to start')
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports to list')
+    parser.add_argument('--output', default='startup-results.json', help='results file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--max-ms', type=float, help='fail when the median startup is slower than this')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('FYYUR_ENV', 'testing')
+    # One untimed run first so every timed run starts with warm .pyc files
+    run_once(env)
+
+    phases = {'import': [], 'create': [], 'total': []}
+    modules = {}
+    for _ in range(args.runs):
+        timing, imports = run_once(env)
+        phases['import'].append(timing['import_ms'])
+        phases['create'].append(timing['create_ms'])
+        phases['total'].append(timing['import_ms'] + timing['create_ms'])
+        for module, cumulative in imports.items():
+            modules.setdefault(module, []).append(cumulative)
+
+    results = {
+        'commit': git_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'profile': env['FYYUR_ENV'],
+        'runs': args.runs,
+    }
+    results.update((phase, summary(samples)) for phase, samples in phases.items())
+    slowest = sorted(((statistics.median(samples), module) for module, samples in modules.items()),
+                     reverse=True)[:args.top]
+    results['imports'] = {module: round(median, 3) for median, module in slowest}
+
+    print(f'{"phase":8} {"p50 ms":>8} {"p90 ms":>8} {"min ms":>8} {"max ms":>8}')
+    for phase in phases:
+        timing = results[phase]
+        print(f'{phase:8} {timing["p50_ms"]:8.2f} {timing["p90_ms"]:8.2f} {timing["min_ms"]:8.2f} '
+              f'{timing["max_ms"]:8.2f}')
+    print(f'\n{"import":32} {"p50 ms":>8}')
+    for module, median in results['imports'].items():
+        print(f'{module:32} {median:8.2f}')
+
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+    if args.max_ms is not None and results['total']['p50_ms'] > args.max_ms:
+        sys.exit(f'Median startup {results["total"]["p50_ms"]:.1f} ms is over the {args.max_ms:g} ms budget')
+
+
+if __name__ == '__main__':
+    main()
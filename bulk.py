@@ -0,0 +1,75 @@
+import click
+from flask import Blueprint, current_app, request, Response, stream_with_context, abort, jsonify
+
+bp = Blueprint('bulk', __name__, cli_group=None)
+
+#  Import
+#  ----------------------------------------------------------------
+
+@bp.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']),
+              help='File format, guessed from the extension by default.')
+@click.option('--chunk-size', type=int, help='Rows validated and written per batch.')
+def import_catalog(kind, path, file_format, chunk_size):
+  """Bulk import venues, artists or shows from a CSV or JSONL file."""
+  # Imported here so the app starts without the importer and its forms
+  from importer import detect_format, import_file
+
+  def progress(report):
+    click.echo(f'{report.imported + report.failed} rows, {report.failed} failed, '
+               f'{report.rows_per_second:.0f} rows/s', err=True)
+
+  with open(path, newline='', encoding='utf-8') as stream:
+    report = import_file(kind, stream, file_format or detect_format(path),
+                         chunk_size or current_app.config['IMPORT_CHUNK_SIZE'], progress,
+                         current_app.config['IMPORT_MAX_REPORTED_ERRORS'])
+
+  for error in report.errors:
+    click.echo(f'line {error["line"]}: {error["errors"]}', err=True)
+  if report.errors_omitted:
+    click.echo(f'and {report.errors_omitted} more failed rows', err=True)
+  click.echo(f'Imported {report.imported} {kind}, {report.failed} failed '
+             f'({report.rows_per_second:.0f} rows/s)')
+
+@bp.route('/import/<kind>', methods=['POST'])
+def import_upload_submission(kind):
+  # Same pipeline as the import command, for a file uploaded as 'file'
+  from importer import IMPORTERS, import_upload
+
+  upload = request.files.get('file')
+  if kind not in IMPORTERS or upload is None:
+    abort(400)
+
+  config = current_app.config
+  report = import_upload(kind, upload, request.form.get('format'), config['IMPORT_CHUNK_SIZE'],
+                         config['IMPORT_MAX_REPORTED_ERRORS'])
+  return jsonify(report.to_dict())
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.cli.command('export')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), default='csv')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+def export_catalog(kind, file_format, output):
+  """Export every venue, artist or show as CSV or JSONL."""
+  from exporter import export
+
+  for piece in export(kind, file_format):
+    output.write(piece)
+
+@bp.route('/export/<kind>')
+def export_download(kind):
+  # Stream the table a chunk at a time straight from a server-side cursor
+  from exporter import COLUMNS, FORMATS, export
+
+  file_format = request.args.get('format', 'csv')
+  if kind not in COLUMNS or file_format not in FORMATS:
+    abort(404)
+
+  return Response(stream_with_context(export(kind, file_format)),
+                  mimetype=FORMATS[file_format],
+                  headers={'Content-Disposition': f'attachment; filename={kind}.{file_format}'})
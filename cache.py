@@ -0,0 +1,293 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class MemoryCache:
+    """Per-process LRU cache with a TTL on every entry."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it is missing or expired; return whether it was set."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                return False
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache:
+    """Cache shared by every worker on a host through a directory.
+
+    Doubles as the local stand-in for a shared cache server in development
+    and tests. Entries are pickled to one file per key and replaced
+    atomically, so readers never see a partial write.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as entry_file:
+                expires, value = pickle.load(entry_file)
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, 'wb') as entry_file:
+            pickle.dump((expires, value), entry_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self._path(key))
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it is missing or expired; return whether it was set.
+
+        The entry is written to a temporary file and then linked to its
+        name, which fails when the name exists. That makes this atomic
+        across processes, and readers never see the entry half written.
+        """
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as entry_file:
+                pickle.dump((time.time() + ttl if ttl else None, value), entry_file,
+                            pickle.HIGHEST_PROTOCOL)
+            for attempt in range(2):
+                try:
+                    os.link(temporary_path, self._path(key))
+                except FileExistsError:
+                    # get() removes the file when it has expired, so retry once
+                    if self.get(key) is not None:
+                        return False
+                    continue
+                return True
+            return False
+        finally:
+            os.remove(temporary_path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+
+class RedisCache:
+    """Cache shared by every worker and host through Redis.
+
+    Needs the optional redis package, which is only imported when this
+    backend is configured.
+    """
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        ex=int(ttl) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                    ex=int(ttl) if ttl else None, nx=True))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def make_cache_backend(config, max_entries=None):
+    """Build the cache backend named by PAGE_CACHE_BACKEND. max_entries
+    overrides PAGE_CACHE_MAX_ENTRIES for the in-process backend."""
+    backend = config['PAGE_CACHE_BACKEND']
+    if backend == 'filesystem':
+        return FileSystemCache(config['PAGE_CACHE_DIR'])
+    if backend == 'redis':
+        return RedisCache(config['PAGE_CACHE_REDIS_URL'])
+    return MemoryCache(max_entries or config['PAGE_CACHE_MAX_ENTRIES'])
+
+
+class PageCache:
+    """Whole responses keyed by path and query arguments.
+
+    Every path has a generation token that is part of its keys, so
+    invalidating a path drops all of its argument variants at once by
+    replacing the token. A missing token is replaced by a fresh random one,
+    never a default, so an evicted token can't resurrect old entries.
+
+    Entries stay fresh for ttl seconds and are then kept, stale, for another
+    stale_ttl seconds so they can be served while one caller rebuilds them.
+    Builds are single-flight: lock() lets one caller per key build the page
+    while the others wait() for its result instead of building it again.
+    The lock lives in the backend, so with a shared backend it covers every
+    worker, not just the threads of one process.
+    """
+
+    def __init__(self, backend, ttl, stale_ttl=0, lock_timeout=30, poll_interval=0.05):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    def get(self, key):
+        """Return (value, stale) for key, or (None, False) when it is missing."""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None, False
+        fresh_until, value = entry
+        return value, fresh_until <= time.time()
+
+    def set(self, key, value):
+        self.backend.set(key, (time.time() + self.ttl, value), self.ttl + self.stale_ttl)
+
+    def lock(self, key):
+        """Try to become the one caller building key. The lock expires after
+        lock_timeout so a crashed build can't block the page for good."""
+        return self.backend.add(self._lock_key(key), True, self.lock_timeout)
+
+    def unlock(self, key):
+        self.backend.delete(self._lock_key(key))
+
+    def wait(self, key, timeout):
+        """Wait up to timeout seconds for the build holding key's lock and
+        return its value, or None when the build stored nothing or took too
+        long."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            value, stale = self.get(key)
+            if value is not None and not stale:
+                return value
+            if self.backend.get(self._lock_key(key)) is None:
+                return self.get(key)[0]
+            time.sleep(self.poll_interval)
+        return None
+
+    def invalidate(self, *paths):
+        for path in paths:
+            self.backend.set(self._generation_key(path), uuid.uuid4().hex)
+
+    def key(self, path, args):
+        """Return the key for a path and its arguments. Take it once, before
+        building the page, so a page built while its path is invalidated
+        lands under the old generation and is never served."""
+        generation = self.backend.get(self._generation_key(path))
+        if generation is None:
+            # Concurrent callers must agree on the new token, so only the
+            # first one gets to store it
+            self.backend.add(self._generation_key(path), uuid.uuid4().hex)
+            generation = self.backend.get(self._generation_key(path)) or uuid.uuid4().hex
+        return f'page:{path}:{generation}:{urlencode(sorted(args.items(multi=True)))}'
+
+    def _generation_key(self, path):
+        return f'generation:{path}'
+
+    def _lock_key(self, key):
+        return f'lock:{key}'
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja ``{% cache key, ttl %}...{% endcache %}`` blocks.
+
+    The rendered block is stored in ``environment.fragment_cache``, any of
+    the backends above, under the template name, the block's line and the
+    key. Keys should change whenever the block's content would, so they are
+    built from ids and row versions and ttl only bounds how long unused
+    fragments linger. Without a fragment_cache blocks render normally.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None)
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        name = nodes.Const(f'{parser.name}:{lineno}')
+        return nodes.CallBlock(
+            self.call_method('_cached_fragment', [name, key, ttl]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cached_fragment(self, name, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = f'fragment:{name}:{key}'
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            cache.set(key, str(fragment), ttl)
+        return Markup(fragment)
@@ -1,11 +1,219 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+# Every deployment-specific setting below can be set from the environment.
+# FYYUR_ENV picks the profile the defaults come from: 'development' (the
+# default), 'testing' or 'production'
+PROFILES = ('development', 'testing', 'production')
+
+
+def env(name, default=None, cast=str):
+    # Read a setting from the environment, falling back to default when it is
+    # unset or empty
+    value = os.environ.get(name, '').strip()
+    if not value:
+        return default
+    if cast is bool:
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
+
+
+ENV_NAME = env('FYYUR_ENV', 'development')
+if ENV_NAME not in PROFILES:
+    raise RuntimeError(f'FYYUR_ENV must be one of {", ".join(PROFILES)}, not {ENV_NAME!r}')
+PRODUCTION = ENV_NAME == 'production'
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 # Enable debug mode.
-DEBUG = True
+DEBUG = env('DEBUG', ENV_NAME == 'development', bool)
+TESTING = ENV_NAME == 'testing'
+WTF_CSRF_ENABLED = env('WTF_CSRF_ENABLED', not TESTING, bool)
+
+# Every worker must share one key, or sessions and CSRF tokens issued by one
+# worker are rejected by the others. Production refuses to start without it
+SECRET_KEY = env('SECRET_KEY')
+if SECRET_KEY is None:
+    if PRODUCTION:
+        raise RuntimeError('SECRET_KEY must be set in production')
+    SECRET_KEY = f'fyyur-{ENV_NAME}-key'
+
+# Connect to the database. Hosting platforms still hand out postgres://
+# URLs, which SQLAlchemy no longer accepts
+DATABASE_DEFAULTS = {
+    'development': 'postgresql:///fyyurdb',
+    'testing': 'sqlite://',
+    'production': None,
+}
+SQLALCHEMY_DATABASE_URI = env('DATABASE_URL', DATABASE_DEFAULTS[ENV_NAME])
+if SQLALCHEMY_DATABASE_URI is None:
+    raise RuntimeError('DATABASE_URL must be set in production')
+if SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
+    SQLALCHEMY_DATABASE_URI = 'postgresql://' + SQLALCHEMY_DATABASE_URI[len('postgres://'):]
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process. Size it so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below Postgres'
+# max_connections. DB_POOL_TIMEOUT is how long a request waits for a free
+# connection, DB_POOL_RECYCLE replaces connections before the server or a
+# proxy drops them, and DB_POOL_PRE_PING checks each connection on checkout
+# so a restarted database doesn't fail the first request of every worker.
+# DB_STATEMENT_TIMEOUT (milliseconds, 0 for none) cancels runaway queries on
+# Postgres
+DB_POOL_SIZE = env('DB_POOL_SIZE', 5, int)
+DB_MAX_OVERFLOW = env('DB_MAX_OVERFLOW', 10 if PRODUCTION else 5, int)
+DB_POOL_TIMEOUT = env('DB_POOL_TIMEOUT', 10 if PRODUCTION else 30, int)
+DB_POOL_RECYCLE = env('DB_POOL_RECYCLE', 1800, int)
+DB_POOL_PRE_PING = env('DB_POOL_PRE_PING', True, bool)
+DB_STATEMENT_TIMEOUT = env('DB_STATEMENT_TIMEOUT', 30000 if PRODUCTION else 0, int)
+
+
+def engine_options(uri):
+    # SQLite has no server to pool connections to or time statements out on,
+    # so it keeps Flask-SQLAlchemy's own defaults
+    if uri.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'}
+    return options
+
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Number of shows per /shows page, and the most a client may ask for
+SHOWS_PAGE_SIZE = 30
+SHOWS_MAX_PAGE_SIZE = 100
+
+# Stream the full /artists and /shows listings by default instead of only
+# on ?stream=1, reading STREAM_CHUNK_SIZE rows per server-side cursor fetch
+STREAM_LISTINGS = False
+STREAM_CHUNK_SIZE = 500
+
+# Seconds each worker keeps its genre lookup before reloading it. A worker
+# drops it as soon as it commits a genre change itself, the others pick the
+# change up within this long
+GENRE_CACHE_TTL = 60
+
+# Search backend for venue and artist search: 'postgres', 'sqlite' or 'like'.
+# Left unset, the backend matching the database dialect is used
+SEARCH_BACKEND = env('SEARCH_BACKEND')
+
+# Most name completions /search/suggest returns per entity type
+SUGGEST_LIMIT = 10
+
+# Results per entity type on each /search page, and the most a client may
+# ask for
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Rows validated and written per batch by the import command and upload
+# endpoint, and how many row errors an import keeps and reports
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+# Rows fetched per server-side cursor round trip, and written per response
+# chunk, by the catalog export
+EXPORT_CHUNK_SIZE = 1000
+
+# Items per /api/v1 collection page, and the most a client may ask for
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Worker processes serving the app, set by gunicorn.conf.py
+WEB_CONCURRENCY = env('WEB_CONCURRENCY', 1, int)
+
+# Full-page cache for anonymous GET pages. 'memory' keeps pages per worker,
+# 'filesystem' shares them between the workers on a host through
+# PAGE_CACHE_DIR and 'redis' shares them everywhere (needs the redis package).
+# Invalidation only reaches the cache it runs against: with 'memory', a write
+# clears the pages of the worker that handled it and the other workers keep
+# serving theirs until PAGE_CACHE_TTL runs out. So 'memory' is only the
+# default for a single worker
+PAGE_CACHE_ENABLED = env('PAGE_CACHE_ENABLED', not (DEBUG or TESTING), bool)
+PAGE_CACHE_BACKEND = env('PAGE_CACHE_BACKEND', 'memory' if WEB_CONCURRENCY == 1 else 'filesystem')
+PAGE_CACHE_TTL = env('PAGE_CACHE_TTL', 60, int)
+# Seconds a page may be served stale while a single request rebuilds it
+PAGE_CACHE_STALE_TTL = 300
+# Longest a build may hold a page's lock, and how long concurrent requests
+# wait for it before rendering the page themselves
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_WAIT_TIMEOUT = 10
+PAGE_CACHE_MAX_ENTRIES = 512
+PAGE_CACHE_DIR = env('PAGE_CACHE_DIR', os.path.join(basedir, '.page_cache'))
+PAGE_CACHE_REDIS_URL = env('PAGE_CACHE_REDIS_URL')
+
+# Fragment cache for {% cache %} blocks in templates (show tiles, venue
+# areas), stored in the same kind of backend as the page cache
+FRAGMENT_CACHE_ENABLED = env('FRAGMENT_CACHE_ENABLED', not (DEBUG or TESTING), bool)
+FRAGMENT_CACHE_TTL = 3600
+FRAGMENT_CACHE_MAX_ENTRIES = 4096
+
+# Compiled templates. Workers share the bytecode of compiled templates
+# through TEMPLATE_CACHE_DIR, and outside debug mode load them from the bundle
+# built with flask compile-templates at TEMPLATE_BUNDLE when there is one
+TEMPLATE_CACHE_ENABLED = env('TEMPLATE_CACHE_ENABLED', not TESTING, bool)
+TEMPLATE_CACHE_DIR = env('TEMPLATE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+TEMPLATE_BUNDLE = env('TEMPLATE_BUNDLE', os.path.join(basedir, '.template_bundle'))
+
+# Static assets. flask build-assets concatenates and minifies each bundle
+# below, copies every file under static/ into ASSET_BUILD_DIR with a content
+# hash in its name, and writes gzip and brotli variants (the latter with the
+# brotli package) served to clients that accept them. Built files are cached
+# for ASSET_MAX_AGE seconds as immutable. Debug mode serves the sources
+ASSET_BUNDLES = {
+    'css/app.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'js/app.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+ASSET_BUILD_ENABLED = env('ASSET_BUILD_ENABLED', not DEBUG, bool)
+ASSET_BUILD_DIR = 'dist'
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# Responsive images, which need Pillow (and a Pillow built with libavif for
+# AVIF). Images under static/ and the venue and artist images ingested into
+# IMAGE_STORE_DIR with flask ingest-images are served resized to
+# IMAGE_WIDTHS in each of IMAGE_FORMATS, last one being the fallback for
+# older browsers. Resized copies are kept in IMAGE_CACHE_DIR. List tiles
+# show IMAGE_THUMBNAIL_WIDTH wide thumbnails. One request renders each
+# copy while the others wait for it, for up to IMAGE_RENDER_TIMEOUT seconds
+IMAGE_STORE_DIR = env('IMAGE_STORE_DIR', os.path.join(basedir, 'media'))
+IMAGE_CACHE_DIR = env('IMAGE_CACHE_DIR', os.path.join(basedir, '.image_cache'))
+IMAGE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_DEFAULT_WIDTH = 960
+IMAGE_THUMBNAIL_WIDTH = 360
+IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+IMAGE_QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 80}
+IMAGE_MAX_AGE = ASSET_MAX_AGE
+IMAGE_RENDER_TIMEOUT = 60
+
+# Per-request statement counts and database time, sent in a Server-Timing
+# header and logged. In debug and testing mode a statement repeated this
+# many times in one request is logged as a probable N+1 with its call site
+QUERY_STATS_ENABLED = env('QUERY_STATS_ENABLED', True, bool)
+QUERY_REPEAT_THRESHOLD = 3
 
-# Connect to the database
-SQLALCHEMY_DATABASE_URI = 'postgres:///fyyurdb'
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+# Warm up the app before a pre-fork server forks its workers (see wsgi.py):
+# compile the templates, load the lookups and render the listings and the
+# WARMUP_DETAIL_PAGES busiest venue and artist pages into the caches
+WARMUP_ENABLED = env('WARMUP_ENABLED', PRODUCTION, bool)
+WARMUP_DETAIL_PAGES = env('WARMUP_DETAIL_PAGES', 20, int)
@@ -0,0 +1,88 @@
+import csv
+import datetime
+import io
+import json
+
+from flask import current_app
+
+from models import db, Venue, Artist, Show
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+COLUMNS = {
+    'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'website', 'image_link',
+               'facebook_link', 'seeking_talent', 'seeking_description', 'genres',
+               'upcoming_show_count', 'next_show_at'],
+    'artists': ['id', 'name', 'city', 'state', 'phone', 'website', 'image_link',
+                'facebook_link', 'seeking_venue', 'seeking_description', 'genres',
+                'upcoming_show_count', 'next_show_at'],
+    'shows': ['id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name'],
+}
+
+
+def _listing_records(kind, model, chunk_size):
+    # The server-side cursor hands rows over chunk_size at a time, and each
+    # chunk's genres come in with one extra select-in query
+    query = model.query.options(db.selectinload(model.genres)).order_by(model.id)
+    for entity in query.yield_per(chunk_size):
+        record = {column: getattr(entity, column) for column in COLUMNS[kind] if column != 'genres'}
+        record['genres'] = [genre.name for genre in entity.genres]
+        yield record
+
+
+def _show_records(chunk_size):
+    query = Show.query.options(db.joinedload(Show.venue), db.joinedload(Show.artist)).order_by(Show.id)
+    for show in query.yield_per(chunk_size):
+        yield {
+            'id': show.id,
+            'start_time': show.start_time,
+            'venue_id': show.venue_id,
+            'venue_name': show.venue.name,
+            'artist_id': show.artist_id,
+            'artist_name': show.artist.name,
+        }
+
+
+def records(kind, chunk_size):
+    """Yield the rows of one catalog table as flat dictionaries."""
+    if kind == 'venues':
+        return _listing_records(kind, Venue, chunk_size)
+    if kind == 'artists':
+        return _listing_records(kind, Artist, chunk_size)
+    return _show_records(chunk_size)
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def export(kind, format='csv', chunk_size=None):
+    """Yield a whole catalog table as CSV or JSONL text, one piece per chunk
+    of rows, so memory stays flat however large the table is."""
+    chunk_size = chunk_size or current_app.config['EXPORT_CHUNK_SIZE']
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS[kind])
+        writer.writeheader()
+
+    for count, record in enumerate(records(kind, chunk_size), start=1):
+        if format == 'csv':
+            if 'genres' in record:
+                record['genres'] = ','.join(record['genres'])
+            writer.writerow({key: _plain(value) for key, value in record.items()})
+        else:
+            buffer.write(json.dumps(record, default=_plain))
+            buffer.write('\n')
+
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
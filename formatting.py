@@ -0,0 +1,38 @@
+import datetime
+from functools import lru_cache
+
+import babel
+import babel.dates
+import dateutil.parser
+
+# Named formats accepted by the datetime filter, anything else is used as a
+# babel pattern as is
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format, locale):
+    """Return the parsed babel pattern and locale for a (format, locale)
+    pair, so each pattern is only compiled once per process."""
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+    return pattern, babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, format, locale):
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+    """Format a datetime for display, memoized on (value, format, locale).
+
+    Native datetimes are formatted directly; strings are still accepted and
+    parsed first for callers that only have the text form.
+    """
+    if not isinstance(value, datetime.datetime):
+        value = dateutil.parser.parse(value)
+    return _format_datetime(value, format, locale)
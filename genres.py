@@ -0,0 +1,58 @@
+import threading
+import time
+
+# The order the forms have always listed the genres in. Genres added since
+# are listed by name before Other. The seed migration (e2a64c19f803) keeps a
+# frozen copy of this list
+GENRE_ORDER = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+
+def _choice_order(name):
+    if name in GENRE_ORDER:
+        return GENRE_ORDER.index(name), ''
+    return GENRE_ORDER.index('Other') - 0.5, name
+
+
+class GenreCache:
+    """In-process genre name to id lookup.
+
+    Loaded on first use through the loader, which returns (name, id) rows,
+    and dropped by invalidate() whenever the genre table changes so the
+    next lookup reloads it. Each worker holds its own copy, as does a
+    preloading master before it forks, and only the process committing a
+    change drops its copy. With a ttl every copy is also reloaded ttl
+    seconds after loading, so other processes see a change within ttl.
+    """
+
+    def __init__(self, loader, ttl=None):
+        self._loader = loader
+        self._ttl = ttl
+        self._ids = None
+        self._expires = None
+        self._lock = threading.Lock()
+
+    def ids(self):
+        ids = self._ids
+        if ids is None or self._expired():
+            with self._lock:
+                if self._ids is None or self._expired():
+                    self._ids = {name: genre_id for name, genre_id in self._loader()}
+                    self._expires = time.monotonic() + self._ttl if self._ttl else None
+                ids = self._ids
+        return ids
+
+    def choices(self):
+        """Return the genres as (value, label) pairs for select fields, in
+        the order the forms have always listed them."""
+        return [(name, name) for name in sorted(self.ids(), key=_choice_order)]
+
+    def invalidate(self):
+        self._ids = None
+
+    def _expired(self):
+        return self._expires is not None and self._expires <= time.monotonic()
@@ -0,0 +1,12 @@
+# gunicorn settings: gunicorn -c gunicorn.conf.py
+import os
+
+wsgi_app = 'wsgi:app'
+
+# Build and warm up the app once in the master, before forking the workers
+preload_app = True
+
+bind = os.environ.get('BIND', f'0.0.0.0:{os.environ.get("PORT", "5000")}')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * os.cpu_count() + 1))
+# Tell the app how many workers share its caches (see PAGE_CACHE_BACKEND)
+os.environ['WEB_CONCURRENCY'] = str(workers)
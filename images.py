@@ -0,0 +1,90 @@
+import os
+from urllib.parse import urlparse
+import click
+from flask import Blueprint, current_app, request, send_file, abort
+from models import db, Venue, Artist, Show
+from services import invalidate_show_pages
+from imaging import (FORMATS, derivative_file, build_derivatives, ingest_image, static_images,
+                     thumbnail_widths)
+
+bp = Blueprint('images', __name__, cli_group=None)
+
+#  Derivatives
+#  ----------------------------------------------------------------
+
+@bp.route('/images/<any(static, store):origin>/<any(avif, webp, jpeg):fmt>/<int:width>/<path:name>')
+def derivative(origin, fmt, width, name):
+  # Resized copies are rendered on first request and kept on disk. URLs
+  # carrying the current version of the original never change content, so
+  # they are cached as immutable
+  found = derivative_file(origin, name, width, fmt)
+  if found is None:
+    abort(404)
+  path, version = found
+  immutable = request.args.get('v') == version
+  response = send_file(path, mimetype=FORMATS[fmt][0],
+                       max_age=current_app.config['IMAGE_MAX_AGE'] if immutable else None)
+  if immutable:
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+  return response
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@bp.cli.command('build-images')
+def build_images():
+  """Render the resized copies of the static and ingested images."""
+  rendered = 0
+  for name in static_images():
+    rendered += build_derivatives('static', name) or 0
+  keys = set()
+  for model in (Venue, Artist):
+    keys.update(key for key, in db.session.query(model.image_key).filter(model.image_key != None))
+  for key in sorted(keys):
+    rendered += build_derivatives('store', key) or 0
+    rendered += build_derivatives('store', key, thumbnail_widths()) or 0
+  click.echo(f'Rendered {rendered} images')
+
+@bp.cli.command('ingest-images')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+def ingest_images(directory):
+  """Ingest venue and artist images from a directory of originals.
+
+  The original of an image_link is the file in DIRECTORY named like the last
+  segment of its path. Each one is copied into the image store and its
+  resized copies rendered, and the pages showing it switch to them.
+  """
+  changed = {Venue: set(), Artist: set()}
+  missing = 0
+  for model in (Venue, Artist):
+    rows = db.session.query(model).filter(model.image_link != None, model.image_link != '')
+    for record in rows:
+      filename = os.path.basename(urlparse(record.image_link).path)
+      path = os.path.join(directory, filename)
+      if not filename or not os.path.isfile(path):
+        missing += 1
+        continue
+      try:
+        key = ingest_image(path)
+      except ValueError as error:
+        click.echo(str(error), err=True)
+        continue
+      build_derivatives('store', key)
+      build_derivatives('store', key, thumbnail_widths())
+      if record.image_key != key:
+        record.image_key = key
+        changed[model].add(record.id)
+  db.session.commit()
+  # Show tiles on the pages of the counterparts they played with carry the
+  # image too
+  venue_ids, artist_ids = set(changed[Venue]), set(changed[Artist])
+  if changed[Venue]:
+    artist_ids.update(artist_id for artist_id, in db.session.query(Show.artist_id).filter(
+                        Show.venue_id.in_(changed[Venue])).distinct())
+  if changed[Artist]:
+    venue_ids.update(venue_id for venue_id, in db.session.query(Show.venue_id).filter(
+                       Show.artist_id.in_(changed[Artist])).distinct())
+  invalidate_show_pages(venue_ids=venue_ids, artist_ids=artist_ids)
+  click.echo(f'Ingested {len(changed[Venue])} venue and {len(changed[Artist])} artist images, '
+             f'{missing} not found in {directory}')
@@ -0,0 +1,337 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from werkzeug.utils import safe_join
+
+from assets import asset_url
+
+# Content type and Pillow format name of each derivative format
+FORMATS = {
+    'avif': ('image/avif', 'AVIF'),
+    'webp': ('image/webp', 'WEBP'),
+    'jpeg': ('image/jpeg', 'JPEG'),
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.tif', '.tiff', '.bmp')
+
+# Stored originals are named by the SHA-1 of their content
+_STORE_KEY = re.compile(r'^[0-9a-f]{40}$')
+
+_sources = {}
+_sources_lock = threading.Lock()
+_writable = None
+
+
+def writable_formats():
+    """Return the formats Pillow can write here, or an empty tuple when
+    Pillow isn't installed. AVIF needs a Pillow built with libavif."""
+    global _writable
+    if _writable is None:
+        try:
+            from PIL import features
+        except ImportError:
+            _writable = ()
+        else:
+            _writable = tuple(fmt for fmt in FORMATS if fmt == 'jpeg' or features.check(fmt))
+    return _writable
+
+
+def image_formats():
+    # The configured formats that can be written, in order of preference
+    return [fmt for fmt in current_app.config['IMAGE_FORMATS'] if fmt in writable_formats()]
+
+
+def source_path(origin, name):
+    """Path of the original image name from origin: 'static' for files under
+    the static folder, 'store' for originals ingested with ingest_image()."""
+    if origin == 'static':
+        return safe_join(current_app.static_folder, name)
+    if origin == 'store' and _STORE_KEY.match(name):
+        return os.path.join(current_app.config['IMAGE_STORE_DIR'], name)
+    return None
+
+
+def source_info(origin, name):
+    """Return (version, width, height) of an original image, or None when it
+    is missing or not an image. The version is a hash of its content, which
+    goes into derivative URLs so they can be cached for good."""
+    path = source_path(origin, name)
+    try:
+        stat = os.stat(path) if path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        return None
+    fingerprint = (path, stat.st_mtime_ns, stat.st_size)
+    info = _sources.get(fingerprint)
+    if info is None:
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(path) as image:
+                width, height = image.size
+                if image.getexif().get(0x0112, 1) >= 5:
+                    # Rotated a quarter turn by its EXIF orientation
+                    width, height = height, width
+        except (OSError, UnidentifiedImageError):
+            return None
+        if origin == 'store':
+            version = name[:12]
+        else:
+            with open(path, 'rb') as original:
+                version = hashlib.sha1(original.read()).hexdigest()[:12]
+        info = (version, width, height)
+        with _sources_lock:
+            _sources[fingerprint] = info
+    return info
+
+
+def allowed_widths(info, widths=None):
+    """Widths to offer for an image: the configured widths up to its own
+    width, and its own width when it is narrower than the widest."""
+    _, original, _ = info
+    widths = sorted(set(widths or current_app.config['IMAGE_WIDTHS']))
+    allowed = [width for width in widths if width < original]
+    if not allowed or widths[-1] >= original:
+        allowed.append(original)
+    return allowed
+
+
+def derivative_path(origin, version, width, fmt):
+    return os.path.join(current_app.config['IMAGE_CACHE_DIR'], origin, version, f'{width}.{fmt}')
+
+
+def render_derivative(source, target, width, fmt):
+    """Write source resized to width, keeping its aspect ratio, as fmt."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        # JPEGs can be decoded straight at a fraction of their size. The
+        # size asked for is in stored axes, which a quarter turn by the EXIF
+        # orientation swaps
+        stored_width, stored_height = image.size
+        if image.getexif().get(0x0112, 1) >= 5:
+            image.draft('RGB', (width * stored_width // stored_height, width))
+        else:
+            image.draft('RGB', (width, width * stored_height // stored_width))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        if fmt == 'jpeg' and has_alpha:
+            image = image.convert('RGBA')
+            flattened = Image.new('RGB', image.size, 'white')
+            flattened.paste(image, mask=image.getchannel('A'))
+            image = flattened
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        options = {'quality': current_app.config['IMAGE_QUALITY'][fmt]}
+        if fmt == 'jpeg':
+            options.update(optimize=True, progressive=True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = f'{target}.{os.getpid()}.{threading.get_ident()}.tmp'
+        image.save(temporary, FORMATS[fmt][1], **options)
+    os.replace(temporary, target)
+
+
+def render_once(source, target, width, fmt, timeout, poll_interval=0.05):
+    """Render target unless it exists, with one caller per target doing it
+    across threads and processes while the others wait for its copy.
+
+    The caller creating target.lock exclusively renders it. A lock older
+    than timeout seconds is left from a render that died, and is taken
+    over. Returns whether this call rendered target.
+    """
+    lock = target + '.lock'
+    while not os.path.exists(target):
+        try:
+            descriptor = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            continue
+        except FileExistsError:
+            try:
+                stale = os.stat(lock).st_mtime + timeout < time.time()
+            except FileNotFoundError:
+                continue
+            if stale:
+                try:
+                    os.remove(lock)
+                except FileNotFoundError:
+                    pass
+            else:
+                time.sleep(poll_interval)
+            continue
+        os.close(descriptor)
+        try:
+            if os.path.exists(target):
+                return False
+            render_derivative(source, target, width, fmt)
+            return True
+        finally:
+            try:
+                os.remove(lock)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def derivative_file(origin, name, width, fmt):
+    """Return (path, version) of name resized to width as fmt, rendering it
+    on first use, or None when there is no such image or derivative."""
+    if fmt not in image_formats():
+        return None
+    info = source_info(origin, name)
+    if info is None:
+        return None
+    config = current_app.config
+    widths = set(config['IMAGE_WIDTHS']) | set(thumbnail_widths())
+    if width not in allowed_widths(info, widths):
+        return None
+    version = info[0]
+    path = derivative_path(origin, version, width, fmt)
+    if not os.path.exists(path):
+        render_once(source_path(origin, name), path, width, fmt, config['IMAGE_RENDER_TIMEOUT'])
+    return path, version
+
+
+def build_derivatives(origin, name, widths=None):
+    """Render every derivative of name ahead of use. Returns how many were
+    rendered, or None when name is not an image."""
+    info = source_info(origin, name)
+    if info is None:
+        return None
+    rendered = 0
+    for width in allowed_widths(info, widths):
+        for fmt in image_formats():
+            path = derivative_path(origin, info[0], width, fmt)
+            if render_once(source_path(origin, name), path, width, fmt,
+                           current_app.config['IMAGE_RENDER_TIMEOUT']):
+                rendered += 1
+    return rendered
+
+
+def ingest_image(path):
+    """Copy the image at path into the image store and return its key, the
+    SHA-1 of its content. Raises ValueError when it is not an image."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, UnidentifiedImageError) as error:
+        raise ValueError(f'{path} is not an image: {error}') from error
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as original:
+        for block in iter(lambda: original.read(1 << 20), b''):
+            digest.update(block)
+    key = digest.hexdigest()
+    stored = os.path.join(current_app.config['IMAGE_STORE_DIR'], key)
+    if not os.path.exists(stored):
+        os.makedirs(os.path.dirname(stored), exist_ok=True)
+        temporary = f'{stored}.{os.getpid()}.tmp'
+        shutil.copyfile(path, temporary)
+        os.replace(temporary, stored)
+    return key
+
+
+def static_images():
+    """Return the static files that are images, relative to the static folder."""
+    static_folder = current_app.static_folder
+    names = []
+    for root, dirs, files in os.walk(static_folder):
+        relative = os.path.relpath(root, static_folder)
+        if relative.split(os.sep)[0] == current_app.config['ASSET_BUILD_DIR']:
+            dirs[:] = []
+            continue
+        for filename in files:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                names.append(os.path.normpath(os.path.join(relative, filename)).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def thumbnail_widths():
+    # List tiles at 1x and 2x
+    width = current_app.config['IMAGE_THUMBNAIL_WIDTH']
+    return (width, 2 * width)
+
+
+#----------------------------------------------------------------------------#
+# Template helpers.
+#----------------------------------------------------------------------------#
+
+def _attributes(attributes):
+    # class is a keyword, so templates pass it as class_
+    return ''.join(f' {name.rstrip("_").replace("_", "-")}="{escape(value)}"'
+                   for name, value in attributes.items() if value is not None)
+
+
+def _img(src, alt, attributes):
+    return Markup(f'<img src="{escape(src or "")}" alt="{escape(alt)}"{_attributes(attributes)} />')
+
+
+def responsive_image(name, alt='', sizes='100vw', origin='static', widths=None, fallback=None, **attributes):
+    """Markup for a <picture> of the image name from origin, offering each
+    format in IMAGE_FORMATS at every width up to the image's own, with
+    sizes telling the browser how wide it is shown. Other attributes go on
+    the <img>, which falls back to the original file or fallback when the
+    image can't be resized here."""
+    attributes.setdefault('decoding', 'async')
+    formats = image_formats()
+    info = source_info(origin, name) if formats else None
+    if info is None:
+        if fallback is None and origin == 'static':
+            fallback = asset_url(name)
+        return _img(fallback, alt, attributes)
+
+    version, original_width, original_height = info
+    widths = allowed_widths(info, widths)
+
+    def srcset(fmt):
+        return ', '.join(
+            f'{url_for("images.derivative", origin=origin, fmt=fmt, width=width, name=name, v=version)} {width}w'
+            for width in widths)
+
+    # The <img> gets the fallback format at the largest width up to
+    # IMAGE_DEFAULT_WIDTH, and its size so the page doesn't shift as it loads
+    fallback_format = formats[-1]
+    default_width = max([width for width in widths if width <= current_app.config['IMAGE_DEFAULT_WIDTH']]
+                        or widths[:1])
+    attributes.setdefault('width', default_width)
+    attributes.setdefault('height', round(original_height * default_width / original_width))
+    src = url_for('images.derivative', origin=origin, fmt=fallback_format, width=default_width, name=name, v=version)
+
+    markup = ['<picture>']
+    for fmt in formats[:-1]:
+        markup.append(f'<source type="{FORMATS[fmt][0]}" srcset="{escape(srcset(fmt))}" sizes="{escape(sizes)}" />')
+    markup.append(f'<img src="{escape(src)}" srcset="{escape(srcset(fallback_format))}" sizes="{escape(sizes)}" '
+                  f'alt="{escape(alt)}"{_attributes(attributes)} />')
+    markup.append('</picture>')
+    return Markup(''.join(markup))
+
+
+def stored_image(image_link, image_key, alt='', sizes='100vw', thumbnail=False, **attributes):
+    """Markup for a venue or artist image: responsive derivatives of the
+    ingested copy when there is one, else the image_link as it is. List
+    tiles pass thumbnail=True to get IMAGE_THUMBNAIL_WIDTH sized images."""
+    attributes.setdefault('loading', 'lazy')
+    if not image_key:
+        return _img(image_link, alt, attributes)
+    widths = None
+    if thumbnail:
+        widths = thumbnail_widths()
+        sizes = f'(min-width: 768px) {widths[0]}px, 100vw'
+    return responsive_image(image_key, alt, sizes, 'store', widths, image_link, **attributes)
+
+
+def init_images(app):
+    app.add_template_global(responsive_image)
+    app.add_template_global(stored_image)
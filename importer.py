@@ -0,0 +1,309 @@
+import abc
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.datastructures import MultiDict
+
+from models import (db, Venue, Artist, Show, Genre, venue_genres, artist_genres, genre_cache,
+                    refresh_show_counters)
+from services import search_backend, suggest_index, page_cache, page_path, invalidate_show_pages
+from forms import VenueForm, ArtistForm, ShowForm
+
+# Checkbox values that read as unchecked when they come from a file
+FALSE_VALUES = ('', '0', 'n', 'no', 'false', 'off')
+
+
+def detect_format(filename):
+    """Guess the file format from its extension, defaulting to CSV."""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_records(stream, format):
+    """Yield (line number, record dict) pairs from a CSV or JSONL text stream
+    without reading the whole file into memory."""
+    if format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as error:
+                    yield line_number, error
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+class ImportReport:
+    """Running totals for an import, plus the per-row errors. Only the first
+    max_errors errors are kept, the rest are only counted."""
+
+    def __init__(self, max_errors=None):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.errors_omitted = 0
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+
+    def fail(self, line_number, errors):
+        self.failed += 1
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            self.errors_omitted += 1
+        else:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.perf_counter() - self.started
+        return (self.imported + self.failed) / elapsed if elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+            'errors_omitted': self.errors_omitted
+        }
+
+
+class CatalogImporter(abc.ABC):
+    """Validate and write one kind of record in chunks.
+
+    Each chunk is validated with the matching form, has its foreign keys
+    checked with one query, and is written with bulk inserts and committed
+    on its own, so a bad chunk never takes earlier chunks down with it.
+    """
+
+    form_class = None
+    # Fields a row must carry a value for. The forms fill some absent fields
+    # from their defaults, which is right for a person filling the form in
+    # but would silently invent data for a row of a file
+    required_fields = ()
+
+    def __init__(self, chunk_size=1000, progress=None, max_errors=None):
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.max_errors = max_errors
+
+    def run(self, records):
+        report = ImportReport(self.max_errors)
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk, report)
+            if self.progress:
+                self.progress(report)
+        return report
+
+    def import_chunk(self, chunk, report):
+        valid = []
+        for line_number, record in chunk:
+            if isinstance(record, Exception):
+                report.fail(line_number, {'record': [str(record)]})
+                continue
+            missing = {
+                field: ['This field is required.'] for field in self.required_fields
+                if record.get(field) is None or not str(record[field]).strip()
+            }
+            if missing:
+                report.fail(line_number, missing)
+                continue
+            form = self.form_class(formdata=self.formdata(record), meta={'csrf': False})
+            if form.validate():
+                valid.append((line_number, form.data))
+            else:
+                report.fail(line_number, form.errors)
+
+        valid = self.check_references(valid, report)
+        if not valid:
+            return
+
+        try:
+            self.write([data for line_number, data in valid])
+            db.session.commit()
+        except Exception as error:
+            db.session.rollback()
+            message = str(error).splitlines()[0]
+            for line_number, data in valid:
+                report.fail(line_number, {'database': [message]})
+            return
+        finally:
+            db.session.close()
+        report.imported += len(valid)
+        self.after_commit()
+
+    def formdata(self, record):
+        formdata = MultiDict()
+        for key, value in record.items():
+            if key is None or value is None:
+                continue
+            if isinstance(value, list):
+                formdata.setlist(key, [str(item) for item in value])
+            elif isinstance(value, bool):
+                formdata[key] = 'y' if value else ''
+            else:
+                formdata[key] = str(value)
+        return formdata
+
+    def check_references(self, valid, report):
+        return valid
+
+    @abc.abstractmethod
+    def write(self, rows):
+        """Add the validated rows of a chunk to the session."""
+
+    def after_commit(self):
+        pass
+
+
+class _ListingImporter(CatalogImporter):
+    """Shared import steps for venues and artists, which carry genres."""
+
+    model = None
+    association = None
+    owner_column = None
+    seeking_field = None
+    listing_endpoint = None
+
+    def formdata(self, record):
+        formdata = super().formdata(record)
+        genres = formdata.getlist('genres')
+        if len(genres) == 1:
+            formdata.setlist('genres', [genre.strip() for genre in genres[0].split(',') if genre.strip()])
+        if formdata.get(self.seeking_field, '').strip().lower() in FALSE_VALUES:
+            formdata.pop(self.seeking_field, None)
+        return formdata
+
+    def write(self, rows):
+        # Entities go in as one batched flush, then every genre row for the
+        # chunk goes in as a single executemany
+        columns = set(self.model.__table__.columns.keys()) - {'id'}
+        entities = [
+            self.model(**{key: value for key, value in row.items() if key in columns})
+            for row in rows
+        ]
+        db.session.add_all(entities)
+        db.session.flush()
+
+        genre_ids = genre_cache().ids()
+        genre_rows = [
+            {self.owner_column: entity.id, 'genre_id': genre_ids[name]}
+            for entity, row in zip(entities, rows)
+            for name in set(row['genres'])
+        ]
+        if genre_rows:
+            db.session.execute(self.association.insert(), genre_rows)
+
+        # Hand the search index the chunk at once, with the genres just
+        # written set on the entities rather than lazy loaded one by one
+        chunk_genres = {genre.name: genre for genre in
+                        Genre.query.filter(Genre.id.in_({row['genre_id'] for row in genre_rows}))}
+        for entity, row in zip(entities, rows):
+            set_committed_value(entity, 'genres', [chunk_genres[name] for name in set(row['genres'])])
+        search_backend().index_many(entities)
+        self._written = [(entity.id, entity.name) for entity in entities]
+
+    def after_commit(self):
+        index = suggest_index()
+        for entity_id, name in self._written:
+            index.add(self.model.__tablename__, entity_id, name)
+        page_cache().invalidate(page_path(self.listing_endpoint))
+
+
+class VenueImporter(_ListingImporter):
+    form_class = VenueForm
+    model = Venue
+    association = venue_genres
+    owner_column = 'venue_id'
+    seeking_field = 'seeking_talent'
+    listing_endpoint = 'venues.venues'
+
+
+class ArtistImporter(_ListingImporter):
+    form_class = ArtistForm
+    model = Artist
+    association = artist_genres
+    owner_column = 'artist_id'
+    seeking_field = 'seeking_venue'
+    listing_endpoint = 'artists.artists'
+
+
+class ShowImporter(CatalogImporter):
+    form_class = ShowForm
+    required_fields = ('start_time',)
+
+    def check_references(self, valid, report):
+        # Resolve every venue and artist id in the chunk with one query each
+        def existing(model, key):
+            ids = set()
+            for line_number, data in valid:
+                try:
+                    ids.add(int(data[key]))
+                except (TypeError, ValueError):
+                    pass
+            if not ids:
+                return set()
+            return {row.id for row in db.session.query(model.id).filter(model.id.in_(ids))}
+
+        venue_ids = existing(Venue, 'venue_id')
+        artist_ids = existing(Artist, 'artist_id')
+        checked = []
+        for line_number, data in valid:
+            errors = {}
+            for key, known in (('venue_id', venue_ids), ('artist_id', artist_ids)):
+                try:
+                    data[key] = int(data[key])
+                except (TypeError, ValueError):
+                    errors[key] = ['Not a valid id.']
+                    continue
+                if data[key] not in known:
+                    errors[key] = ['No such record.']
+            if errors:
+                report.fail(line_number, errors)
+            else:
+                checked.append((line_number, data))
+        return checked
+
+    def write(self, rows):
+        db.session.execute(Show.__table__.insert(), [
+            {'venue_id': row['venue_id'], 'artist_id': row['artist_id'], 'start_time': row['start_time']}
+            for row in rows
+        ])
+        self._venue_ids = {row['venue_id'] for row in rows}
+        self._artist_ids = {row['artist_id'] for row in rows}
+        refresh_show_counters(Venue, Venue.id.in_(self._venue_ids))
+        refresh_show_counters(Artist, Artist.id.in_(self._artist_ids))
+
+    def after_commit(self):
+        invalidate_show_pages(self._venue_ids, self._artist_ids)
+
+
+IMPORTERS = {
+    'venues': VenueImporter,
+    'artists': ArtistImporter,
+    'shows': ShowImporter,
+}
+
+
+def import_file(kind, stream, format, chunk_size=1000, progress=None, max_errors=None):
+    """Import a CSV or JSONL text stream of the given kind and return the
+    ImportReport, keeping up to max_errors row errors."""
+    importer = IMPORTERS[kind](chunk_size=chunk_size, progress=progress, max_errors=max_errors)
+    return importer.run(read_records(stream, format))
+
+
+def import_upload(kind, upload, format=None, chunk_size=1000, max_errors=None):
+    """Import an uploaded werkzeug FileStorage, streaming it as text."""
+    format = format or detect_format(upload.filename)
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    return import_file(kind, stream, format, chunk_size, max_errors=max_errors)
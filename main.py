@@ -0,0 +1,139 @@
+import datetime
+import click
+from flask import Blueprint, current_app, render_template, request, url_for, jsonify
+from models import db, Venue, Artist, Show, count_upcoming_shows
+from services import search_backend, suggest_index, cached_page
+from shows import show_tile_details
+
+bp = Blueprint('main', __name__, cli_group=None)
+
+@bp.route('/')
+@cached_page
+def index():
+  return render_template('pages/home.html')
+
+#  Search
+#  ----------------------------------------------------------------
+
+@bp.route('/search')
+def search():
+  # Get the search term and the page window applied to each result type
+  search_term = request.args.get('q', '')
+  limit = request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE'], type=int)
+  limit = max(1, min(limit, current_app.config['SEARCH_MAX_PAGE_SIZE']))
+  offset = max(0, request.args.get('offset', 0, type=int))
+
+  # Search venues, artists and upcoming shows in one go. Shows come back
+  # with their venue and artist already loaded
+  backend = search_backend()
+  venue_count, venue_results = backend.search(Venue, search_term, limit, offset)
+  artist_count, artist_results = backend.search(Artist, search_term, limit, offset)
+  show_count, show_results = backend.search_shows(
+    Show, search_term, datetime.datetime.now(), limit, offset,
+    options=(db.joinedload(Show.venue), db.joinedload(Show.artist))
+  )
+
+  # Resolve the upcoming show counts with one grouped query per entity type
+  venue_show_counts = count_upcoming_shows(Show.venue_id, [venue.id for venue in venue_results])
+  artist_show_counts = count_upcoming_shows(Show.artist_id, [artist.id for artist in artist_results])
+
+  # Build the response dictionary the view is expecting
+  results = {
+    'venues': {
+      'count': venue_count,
+      'data': [{
+        'id': venue.id,
+        'name': venue.name,
+        'num_upcoming_shows': venue_show_counts.get(venue.id, 0)
+      } for venue in venue_results]
+    },
+    'artists': {
+      'count': artist_count,
+      'data': [{
+        'id': artist.id,
+        'name': artist.name,
+        'num_upcoming_shows': artist_show_counts.get(artist.id, 0)
+      } for artist in artist_results]
+    },
+    'shows': {
+      'count': show_count,
+      'data': [show_tile_details(show) for show in show_results]
+    }
+  }
+
+  # Page forward while any result type has more matches past this window
+  pagination = {
+    'prev_url': None,
+    'next_url': None
+  }
+  if offset > 0:
+    pagination['prev_url'] = url_for('.search', q=search_term, limit=limit,
+                                     offset=max(0, offset - limit))
+  if offset + limit < max(venue_count, artist_count, show_count):
+    pagination['next_url'] = url_for('.search', q=search_term, limit=limit,
+                                     offset=offset + limit)
+
+  return render_template('pages/search.html', results=results, search_term=search_term,
+                         pagination=pagination)
+
+@bp.route('/search/suggest')
+def search_suggest():
+  # Serve name completions for the search boxes from the in-memory prefix
+  # index, without touching the database
+  prefix = request.args.get('q', '')
+  limit = request.args.get('limit', current_app.config['SUGGEST_LIMIT'], type=int)
+  limit = max(0, min(limit, current_app.config['SUGGEST_LIMIT']))
+  index = suggest_index()
+
+  return jsonify({
+    'venues': [{'id': venue_id, 'name': name}
+               for venue_id, name in index.complete(prefix, 'venue', limit)],
+    'artists': [{'id': artist_id, 'name': name}
+                for artist_id, name in index.complete(prefix, 'artist', limit)]
+  })
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index():
+  """Rebuild the venue and artist search indexes from scratch."""
+  for model in (Venue, Artist):
+    search_backend().rebuild(model)
+  db.session.commit()
+
+@bp.cli.command('warmup')
+def warmup():
+  """Render the hottest pages into the page and fragment caches."""
+  # Only useful for the filesystem and redis backends, which outlive this
+  # process; servers warm up their own memory caches through wsgi.py
+  from warmup import warm_up
+  summary = warm_up()
+  click.echo(f"Warmed up {summary['templates']} templates and {summary['pages']} pages "
+             f"in {summary['seconds']}s")
+
+@bp.cli.command('compile-templates')
+@click.option('--output', type=click.Path(file_okay=False),
+              help='Bundle directory, by default TEMPLATE_BUNDLE.')
+def compile_templates(output):
+  """Precompile every template into a bundle loaded by the workers."""
+  from services import build_template_bundle
+  output = output or current_app.config['TEMPLATE_BUNDLE']
+  count = build_template_bundle(current_app._get_current_object(), output)
+  click.echo(f'Compiled {count} templates into {output}')
+
+@bp.cli.command('build-assets')
+def build_assets():
+  """Bundle, fingerprint and precompress the static assets."""
+  from assets import build_assets
+  manifest = build_assets(current_app._get_current_object())
+  click.echo(f"Built {len(manifest['files'])} assets, {len(manifest['compressed'])} precompressed, "
+             f"into {current_app.config['ASSET_BUILD_DIR']}")
+
+#  Errors
+#  ----------------------------------------------------------------
+
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@bp.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
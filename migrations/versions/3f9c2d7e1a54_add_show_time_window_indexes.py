@@ -0,0 +1,43 @@
+"""Add show time window, venue location and genre association indexes
+
+Revision ID: 3f9c2d7e1a54
+Revises: cfc1612f0fb6
+Create Date: 2020-05-21 18:42:13.508126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2d7e1a54'
+down_revision = 'cfc1612f0fb6'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time']),
+    # The /shows keyset, so every page is an index range scan
+    ('ix_show_start_time_id', 'show', ['start_time', 'id']),
+    ('ix_venue_state_city', 'venue', ['state', 'city']),
+    ('ix_venue_genres_genre_id_venue_id', 'venue_genres', ['genre_id', 'venue_id']),
+    ('ix_artist_genres_genre_id_artist_id', 'artist_genres', ['genre_id', 'artist_id']),
+]
+
+
+def upgrade():
+    # Postgres can't build indexes CONCURRENTLY inside a transaction, so step
+    # out of the migration transaction for the duration of the builds
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True)
@@ -0,0 +1,55 @@
+"""Add trigram search indexes for venue and artist search
+
+Revision ID: 5d0e8b2f6c17
+Revises: b71e4a0c9d38
+Create Date: 2020-05-23 14:02:31.617540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e8b2f6c17'
+down_revision = 'b71e4a0c9d38'
+branch_labels = None
+depends_on = None
+
+# (index name, table, expression). Every expression the search matches on
+# needs one, or the whole match falls back to a sequential scan; the
+# location expression must read exactly as PostgresSearchBackend builds it
+INDEXES = [
+    ('ix_venue_name_trgm', 'venue', 'name'),
+    ('ix_venue_city_trgm', 'venue', 'city'),
+    ('ix_venue_state_trgm', 'venue', 'state'),
+    ('ix_venue_location_trgm', 'venue', "(city || ', ' || state)"),
+    ('ix_artist_name_trgm', 'artist', 'name'),
+    ('ix_artist_city_trgm', 'artist', 'city'),
+    ('ix_artist_state_trgm', 'artist', 'state'),
+    ('ix_artist_location_trgm', 'artist', "(city || ', ' || state)"),
+    ('ix_genre_name_trgm', 'genre', 'name'),
+]
+
+
+def upgrade():
+    # Trigram indexes only exist on Postgres, other databases search through
+    # their own backend (see search.py)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            op.create_index(name, table, [sa.text(f'{expression} gin_trgm_ops')], unique=False,
+                            postgresql_using='gin',
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    with op.get_context().autocommit_block():
+        for name, table, expression in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True)
@@ -0,0 +1,44 @@
+"""Add change stamps to venue, artist, show and genre
+
+Revision ID: 6e1f0c3b8d27
+Revises: 9d4b7e2c5a31
+Create Date: 2020-05-27 09:31:05.164820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1f0c3b8d27'
+down_revision = '9d4b7e2c5a31'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venue', 'artist', 'show', 'genre')
+
+
+def upgrade():
+    # SQLite can't add a column with a non-constant default, so existing
+    # rows there get a fixed stamp
+    if op.get_bind().dialect.name == 'sqlite':
+        default = sa.text("'2020-05-27 00:00:00'")
+    else:
+        default = sa.func.now()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=default,
+                                       nullable=False))
+
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False,
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            op.drop_index(f'ix_{table}_updated_at', table_name=table,
+                          postgresql_concurrently=True)
+    for table in reversed(TABLES):
+        op.drop_column(table, 'updated_at')
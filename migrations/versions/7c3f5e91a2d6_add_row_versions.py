@@ -0,0 +1,26 @@
+"""Add row versions to venue, artist and show
+
+Revision ID: 7c3f5e91a2d6
+Revises: e2a64c19f803
+Create Date: 2020-05-25 16:48:22.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f5e91a2d6'
+down_revision = 'e2a64c19f803'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,26 @@
+"""Add image store keys to venue and artist
+
+Revision ID: 9d4b7e2c5a31
+Revises: 7c3f5e91a2d6
+Create Date: 2020-05-26 10:12:37.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b7e2c5a31'
+down_revision = '7c3f5e91a2d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('image_key', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'image_key')
@@ -0,0 +1,41 @@
+"""Add upcoming show counters to venue and artist
+
+Revision ID: b71e4a0c9d38
+Revises: 3f9c2d7e1a54
+Create Date: 2020-05-22 09:15:47.220391
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71e4a0c9d38'
+down_revision = '3f9c2d7e1a54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+
+    # Backfill the counters from the existing shows
+    now = datetime.datetime.now()
+    for table in ('venue', 'artist'):
+        op.execute(sa.text(
+            f'UPDATE {table} SET '
+            f'upcoming_show_count = (SELECT count(*) FROM show '
+            f'WHERE show.{table}_id = {table}.id AND show.start_time >= :now), '
+            f'next_show_at = (SELECT min(show.start_time) FROM show '
+            f'WHERE show.{table}_id = {table}.id AND show.start_time >= :now)'
+        ).bindparams(now=now))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'upcoming_show_count')
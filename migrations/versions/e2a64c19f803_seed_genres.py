@@ -0,0 +1,42 @@
+"""Seed the genre table with the genres the forms used to hard-code
+
+Revision ID: e2a64c19f803
+Revises: 5d0e8b2f6c17
+Create Date: 2020-05-24 11:27:05.904412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a64c19f803'
+down_revision = '5d0e8b2f6c17'
+branch_labels = None
+depends_on = None
+
+# A frozen copy of genres.GENRE_ORDER as it stood when this revision was
+# written. Migrations don't import app modules, so later changes to the list
+# can't change what this revision seeds
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+genre = sa.table('genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def upgrade():
+    # The forms now offer whatever is in the genre table, so make sure the
+    # genres they used to list exist
+    existing = {name for name, in op.get_bind().execute(sa.select(genre.c.name))}
+    missing = [{'name': name} for name in GENRES if name not in existing]
+    if missing:
+        op.bulk_insert(genre, missing)
+
+
+def downgrade():
+    # Genres may be referenced by venues and artists by now, leave them be
+    pass
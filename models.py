@@ -0,0 +1,247 @@
+import datetime
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from genres import GenreCache
+
+db = SQLAlchemy()
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+venue_genres = db.Table(
+  'venue_genres',
+  db.Column('venue_id', db.Integer, db.ForeignKey('venue.id'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+  db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table(
+  'artist_genres',
+  db.Column('artist_id', db.Integer, db.ForeignKey('artist.id'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('genre.id'), primary_key=True),
+  db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id')
+)
+
+class Venue(db.Model):
+    __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_state_city', 'state', 'city'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    address = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120), nullable=True)
+    website = db.Column(db.String(120), nullable=True)
+    image_link = db.Column(db.String(500), nullable=True)
+    facebook_link = db.Column(db.String(120), nullable=True)
+    seeking_talent = db.Column(db.Boolean, nullable=True, default=False)
+    seeking_description = db.Column(db.String(500), nullable=True)
+
+    # Key of the ingested copy of image_link in the image store, see
+    # imaging.ingest_image()
+    image_key = db.Column(db.String(40), nullable=True)
+
+    # Denormalized show counters, see refresh_show_counters()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, nullable=True)
+
+    # Row version, bumped on every change to the venue or its shows. Feeds
+    # the API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    # Change stamp, set on every insert and update including bulk updates.
+    # Feeds the API collection ETags, see table_version()
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, server_default=db.func.now())
+
+    # Relationships
+    shows = db.relationship('Show', backref='venue', lazy=True,
+                            cascade='all, delete-orphan')
+    genres = db.relationship('Genre', secondary=venue_genres,
+                              backref=db.backref('venues', lazy=True))
+
+
+class Artist(db.Model):
+    __tablename__ = 'artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(120), nullable=True)
+    website = db.Column(db.String(120), nullable=True)
+    image_link = db.Column(db.String(500), nullable=True)
+    facebook_link = db.Column(db.String(120), nullable=True)
+    seeking_venue = db.Column(db.Boolean, nullable=True, default=False)
+    seeking_description = db.Column(db.String(500), nullable=True)
+
+    # Key of the ingested copy of image_link in the image store, see
+    # imaging.ingest_image()
+    image_key = db.Column(db.String(40), nullable=True)
+
+    # Denormalized show counters, see refresh_show_counters()
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    next_show_at = db.Column(db.DateTime, nullable=True)
+
+    # Row version, bumped on every change to the artist or its shows. Feeds
+    # the API ETags
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+    # Change stamp, see Venue.updated_at
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, server_default=db.func.now())
+
+    # Relationships
+    shows = db.relationship('Show', backref='artist', lazy=True)
+    genres = db.relationship('Genre', secondary=artist_genres,
+                              backref=db.backref('artists', lazy=True))
+
+
+class Show(db.Model):
+  __tablename__ = 'show'
+  __table_args__ = (
+    db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_show_start_time_id', 'start_time', 'id'),
+  )
+
+  id = db.Column(db.Integer, primary_key=True)
+  start_time = db.Column(db.DateTime, nullable=False)
+
+  # Foreign Keys
+  venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
+
+  # Row version, feeds the API ETags
+  version = db.Column(db.Integer, nullable=False, server_default='1')
+  __mapper_args__ = {'version_id_col': version}
+
+  # Change stamp, see Venue.updated_at
+  updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.datetime.now,
+                         onupdate=datetime.datetime.now, server_default=db.func.now())
+
+  def __repr__(self):
+        return f'<Show: {self.id} {self.start_time} {self.venue_id} {self.artist_id}>'
+
+
+class Genre(db.Model):
+  __tablename__ = 'genre'
+
+  id = db.Column(db.Integer, primary_key=True)
+  name = db.Column(db.String, nullable=False)
+
+  # Change stamp, see Venue.updated_at
+  updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.datetime.now,
+                         onupdate=datetime.datetime.now, server_default=db.func.now())
+
+  def __repr__(self):
+        return f'<Genre: {self.id} {self.name}>'
+
+
+
+#----------------------------------------------------------------------------#
+# Genre cache.
+#----------------------------------------------------------------------------#
+
+def init_genre_cache(app):
+  # Each app gets its own cache, loaded through the app's session
+  app.extensions['genre_cache'] = GenreCache(lambda: db.session.query(Genre.name, Genre.id).all(),
+                                             ttl=app.config['GENRE_CACHE_TTL'])
+
+def genre_cache():
+  return current_app.extensions['genre_cache']
+
+def _mark_genres_changed(mapper, connection, target):
+  db.object_session(target).info['genres_changed'] = True
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+  db.event.listen(Genre, _event, _mark_genres_changed)
+
+@db.event.listens_for(db.session, 'after_commit')
+def _invalidate_genre_cache(session):
+  # Only drop the cache once genre changes are committed, so a reload can't
+  # miss them
+  if session.info.pop('genres_changed', False):
+    genre_cache().invalidate()
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _forget_genre_changes(session):
+  session.info.pop('genres_changed', None)
+
+def add_genres(association, owner_column, owner_id, genre_names):
+  # Write all of a venue's or artist's genre rows with one executemany,
+  # resolving names through the genre cache
+  genre_ids = genre_cache().ids()
+  rows = [{owner_column: owner_id, 'genre_id': genre_ids[name]} for name in set(genre_names)]
+  if rows:
+    db.session.execute(association.insert(), rows)
+
+#----------------------------------------------------------------------------#
+# Change stamps.
+#----------------------------------------------------------------------------#
+
+def table_version(model):
+  # Row count and latest change stamp of a table, for collection ETags. An
+  # insert or update stamps its row later than any other, and a delete
+  # lowers the count. The stamp is read from its index
+  return tuple(db.session.query(db.func.count(model.id), db.func.max(model.updated_at)).one())
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+def _show_foreign_key(model):
+  return Show.venue_id if model is Venue else Show.artist_id
+
+def record_new_show(show):
+  # Bump the version, and for upcoming shows the counters, of the show's
+  # venue and artist in place so concurrent submissions can't overwrite
+  # each other's increments
+  upcoming = show.start_time >= datetime.datetime.now()
+  for model, parent_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    values = {model.version: model.version + 1}
+    if upcoming:
+      values[model.upcoming_show_count] = model.upcoming_show_count + 1
+      values[model.next_show_at] = db.case(
+        (db.or_(model.next_show_at==None, model.next_show_at>show.start_time), show.start_time),
+        else_=model.next_show_at
+      )
+    model.query.filter(model.id==parent_id).update(values, synchronize_session=False)
+
+def refresh_show_counters(model, *criteria):
+  # Recompute upcoming_show_count and next_show_at from the show table for
+  # every row of the venue or artist model matching the criteria
+  current_date_time = datetime.datetime.now()
+  foreign_key = _show_foreign_key(model)
+  upcoming = db.and_(foreign_key==model.id, Show.start_time>=current_date_time)
+  model.query.filter(*criteria).update({
+    model.upcoming_show_count: db.select(db.func.count(Show.id)).where(upcoming).scalar_subquery(),
+    model.next_show_at: db.select(db.func.min(Show.start_time)).where(upcoming).scalar_subquery(),
+    model.version: model.version + 1
+  }, synchronize_session=False)
+
+def query_past_upcoming_shows(foreign_key, parent_id, counterpart):
+  # Split a venue's or artist's shows into past and upcoming in SQL, joining
+  # in the counterpart artist or venue so templates don't lazy load it
+  current_date_time = datetime.datetime.now()
+  shows = Show.query.options(db.joinedload(counterpart)).filter(foreign_key==parent_id)
+  past_shows = shows.filter(Show.start_time<current_date_time).order_by(Show.start_time).all()
+  upcoming_shows = shows.filter(Show.start_time>=current_date_time).order_by(Show.start_time).all()
+  return past_shows, upcoming_shows
+
+def count_upcoming_shows(foreign_key, parent_ids):
+  # Resolve the upcoming show counts for a page of venues or artists with
+  # one grouped query, keyed by venue or artist id
+  if not parent_ids:
+    return {}
+  current_date_time = datetime.datetime.now()
+  counts = db.session.query(foreign_key, db.func.count(Show.id)).filter(
+             foreign_key.in_(parent_ids),
+             Show.start_time>=current_date_time
+           ).group_by(foreign_key).all()
+  return dict(counts)
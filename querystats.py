@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+# A run of bound parameters, as rendered for an expanding IN, so
+# "IN (?, ?)" and "IN (?, ?, ?)" count as the same statement shape
+_PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s)\s*,)+\s*(?:\?|%\(\w+\)s)\s*\)')
+
+
+class QueryStats:
+    """Statements run while collecting: how many, how long they took and,
+    given the application root, where each statement shape came from."""
+
+    def __init__(self, root=None):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+        self.call_sites = {}
+        self.root = root
+
+    def record(self, statement, duration):
+        statement = _PARAMETER_LIST.sub('(...)', statement)
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+        if self.root is not None and statement not in self.call_sites:
+            self.call_sites[statement] = _call_site(self.root)
+
+    def repeated(self, threshold):
+        """Return (statement, times, call site) for every statement shape run
+        at least threshold times, which is how an N+1 looks from here."""
+        return [
+            (statement, times, self.call_sites.get(statement))
+            for statement, times in self.statements.most_common()
+            if times >= threshold
+        ]
+
+    def server_timing(self):
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _collectors():
+    collectors = list(getattr(_local, 'collectors', ()))
+    if has_request_context() and '_query_stats' in g:
+        collectors.append(g._query_stats)
+    return collectors
+
+
+def _call_site(root):
+    # The innermost frame in the application's own code, skipping this module
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(root) and frame.filename != __file__ \
+                and os.sep + 'site-packages' + os.sep not in frame.filename:
+            return f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started'].pop()
+    for stats in _collectors():
+        stats.record(statement, duration)
+
+
+@contextmanager
+def count_queries(call_sites=True):
+    """Collect every statement run in this thread inside the block,
+    including those of requests made through the test client. Turn
+    call_sites off when timing the block, as finding them walks the stack."""
+    root = None
+    if call_sites:
+        root = (current_app.root_path if has_app_context() else os.getcwd()) + os.sep
+    stats = QueryStats(root)
+    collectors = _local.__dict__.setdefault('collectors', [])
+    collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        collectors.remove(stats)
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail with QueryBudgetExceeded when the block runs more than limit
+    statements, e.g. ``with query_budget(1): client.get('/venues')``."""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        lines = [f'{stats.count} queries run, budget is {limit}:']
+        for statement, times in stats.statements.most_common():
+            lines.append(f'  {times}x {statement.splitlines()[0][:120]}  '
+                         f'({stats.call_sites.get(statement)})')
+        raise QueryBudgetExceeded('\n'.join(lines))
+
+
+def init_query_stats(app):
+    """Count statements and database time for every request of app.
+
+    Totals go out in a Server-Timing header and to the log. In debug and
+    testing mode each statement also records its call site, and statement
+    shapes repeated QUERY_REPEAT_THRESHOLD times in one request are logged
+    as probable N+1 queries.
+
+    Streamed responses run statements while the server sends the body,
+    after the headers have gone out. They are counted in the log line,
+    written when the response is closed, but the Server-Timing header only
+    covers the statements run before the body.
+    """
+    root = app.root_path + os.sep
+
+    def log_query_stats(stats, method, path):
+        app.logger.info('%s %s: %d queries in %.1f ms', method, path, stats.count, stats.duration * 1000)
+        if stats.root is not None:
+            for statement, times, call_site in stats.repeated(app.config['QUERY_REPEAT_THRESHOLD']):
+                app.logger.warning('Probable N+1 on %s: %dx from %s: %s', path, times,
+                                   call_site, statement.splitlines()[0][:200])
+
+    @app.before_request
+    def start_query_stats():
+        if app.config['QUERY_STATS_ENABLED']:
+            g._query_stats = QueryStats(root if app.debug or app.testing else None)
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+        response.headers.add('Server-Timing', stats.server_timing())
+        method, path = request.method, request.path
+        if not response.is_streamed:
+            log_query_stats(stats, method, path)
+            return response
+
+        # The server iterates the body in this thread once the request
+        # context is gone, so keep collecting through the thread's collectors
+        collectors = _local.__dict__.setdefault('collectors', [])
+        collectors.append(stats)
+
+        @response.call_on_close
+        def finish_query_stats():
+            collectors.remove(stats)
+            log_query_stats(stats, method, path)
+
+        return response
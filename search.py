@@ -0,0 +1,234 @@
+from sqlalchemy import bindparam, func, literal, literal_column, or_, select, text, union
+
+
+class LikeSearchBackend:
+    """Case insensitive substring search over name, city, state and genre.
+
+    Works on any database but can't use an index for the leading wildcard,
+    so it is only the fallback for dialects without a dedicated backend.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def search(self, model, term, limit=None, offset=0):
+        """Return the total number of model rows matching term, and the
+        matches from offset up to limit, best first."""
+        term = (term or '').strip()
+        query = model.query
+        if term:
+            query = query.filter(self._matches(model, term))
+        return self._page(query.order_by(model.name), limit, offset)
+
+    def search_shows(self, show, term, after, limit=None, offset=0, options=()):
+        """Return the total number of shows starting at or after the given
+        time whose venue or artist matches term, and the matches from
+        offset up to limit in start time order."""
+        term = (term or '').strip()
+        query = show.query.options(*options).filter(show.start_time>=after)
+        if term:
+            venue = show.venue.property.mapper.class_
+            artist = show.artist.property.mapper.class_
+            query = query.filter(or_(
+                show.venue.has(self._matches(venue, term)),
+                show.artist.has(self._matches(artist, term))
+            ))
+        return self._page(query.order_by(show.start_time, show.id), limit, offset)
+
+    def index(self, entity):
+        pass
+
+    def index_many(self, entities):
+        pass
+
+    def remove(self, entity):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+    def _page(self, query, limit, offset):
+        return query.order_by(None).count(), query.offset(offset).limit(limit).all()
+
+    def _matches(self, model, term):
+        pattern = f'%{term}%'
+        genre = model.genres.property.mapper.class_
+        return or_(
+            model.name.ilike(pattern),
+            model.city.ilike(pattern),
+            model.state.ilike(term),
+            (model.city + ', ' + model.state).ilike(pattern),
+            model.genres.any(genre.name.ilike(pattern))
+        )
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """Trigram search backed by pg_trgm GIN indexes.
+
+    Every searched expression has a trigram index, so the ILIKE filters
+    are answered from the indexes: one bitmap scan over the entity's own
+    fields, unioned with the entities of the genres matched through the
+    genre name index. Results are ranked by the best trigram similarity of
+    any searched field.
+    """
+
+    def search(self, model, term, limit=None, offset=0):
+        term = (term or '').strip()
+        if not term:
+            return super().search(model, term, limit, offset)
+
+        genre = model.genres.property.mapper.class_
+        genre_rank = select(func.max(func.similarity(genre.name, term))).where(
+            model.genres.property.primaryjoin,
+            model.genres.property.secondaryjoin
+        ).correlate(model).scalar_subquery()
+        rank = func.greatest(
+            func.similarity(model.name, term),
+            func.similarity(model.city, term),
+            func.similarity(model.city + ', ' + model.state, term),
+            func.coalesce(genre_rank, literal(0))
+        )
+        query = model.query.filter(self._matches(model, term)).order_by(rank.desc(), model.name)
+        return self._page(query, limit, offset)
+
+    def _matches(self, model, term):
+        # A correlated EXISTS over the genres in the same OR would keep the
+        # planner from combining the index scans, so genre matches are a
+        # separate arm of a UNION. The location concatenates a literal so it
+        # reads exactly like the expression index
+        pattern = f'%{term}%'
+        genres = model.genres.property
+        genre = genres.mapper.class_
+        owner_id = genres.synchronize_pairs[0][1]
+        genre_id = genres.secondary_synchronize_pairs[0][1]
+        matching = union(
+            select(model.id).where(or_(
+                model.name.ilike(pattern),
+                model.city.ilike(pattern),
+                model.state.ilike(term),
+                (model.city + literal_column("', '") + model.state).ilike(pattern)
+            )),
+            select(owner_id).select_from(genres.secondary.join(genre, genre.id==genre_id)).where(
+                genre.name.ilike(pattern))
+        )
+        return model.id.in_(matching)
+
+
+class SqliteSearchBackend(LikeSearchBackend):
+    """FTS5 search for SQLite, mainly so the test database ranks like Postgres.
+
+    Each model gets a ``<table>_search`` FTS5 table using the trigram
+    tokenizer, keyed on the entity id. The table is built on the first
+    search and kept current through index() and remove() afterwards. Terms
+    shorter than a trigram fall back to LIKE matching.
+    """
+
+    def search(self, model, term, limit=None, offset=0):
+        term = (term or '').strip()
+        if len(term) < 3:
+            return super().search(model, term, limit, offset)
+
+        if not self._has_table(model):
+            self.rebuild(model)
+        table = self._table(model)
+        # Page in SQL like the other backends, counting the matches apart.
+        # SQLite takes a negative LIMIT as no limit
+        parameters = {'query': '"' + term.replace('"', '""') + '"'}
+        count = self.db.session.execute(
+            text(f'SELECT count(*) FROM {table} WHERE {table} MATCH :query'), parameters
+        ).scalar()
+        if count <= offset:
+            return count, []
+        page = self.db.session.execute(
+            text(f'SELECT rowid FROM {table} WHERE {table} MATCH :query ORDER BY rank '
+                 'LIMIT :limit OFFSET :offset'),
+            dict(parameters, limit=-1 if limit is None else limit, offset=offset)
+        ).scalars().all()
+        if not page:
+            return count, []
+
+        entities = {entity.id: entity for entity in model.query.filter(model.id.in_(page))}
+        return count, [entities[entity_id] for entity_id in page if entity_id in entities]
+
+    def index(self, entity):
+        self.index_many([entity])
+
+    def index_many(self, entities):
+        # Entities of one model, with their genres loaded. Until the first
+        # search builds the table there is nothing to update
+        if not entities:
+            return
+        model = type(entities[0])
+        if not self._has_table(model):
+            return
+        self.db.session.execute(
+            text(f'DELETE FROM {self._table(model)} WHERE rowid IN :ids').bindparams(
+                bindparam('ids', expanding=True)),
+            {'ids': [entity.id for entity in entities]}
+        )
+        self.db.session.execute(self._insert(model), [self._document(entity) for entity in entities])
+
+    def remove(self, entity):
+        model = type(entity)
+        if not self._has_table(model):
+            return
+        self.db.session.execute(
+            text(f'DELETE FROM {self._table(model)} WHERE rowid = :id'), {'id': entity.id}
+        )
+
+    def rebuild(self, model):
+        # Built on a connection of its own so the index is committed even
+        # when the current request never commits its session
+        table = self._table(model)
+        documents = [
+            self._document(entity)
+            for entity in model.query.options(self.db.selectinload(model.genres))
+        ]
+        with self.db.engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+            connection.execute(text(
+                f'CREATE VIRTUAL TABLE {table} USING fts5('
+                "name, city, state, location, genres, tokenize = 'trigram')"
+            ))
+            if documents:
+                connection.execute(self._insert(model), documents)
+
+    def _table(self, model):
+        return f'{model.__tablename__}_search'
+
+    def _has_table(self, model):
+        return self.db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :table"),
+            {'table': self._table(model)}
+        ).first() is not None
+
+    def _insert(self, model):
+        return text(
+            f'INSERT INTO {self._table(model)} (rowid, name, city, state, location, genres) '
+            'VALUES (:id, :name, :city, :state, :location, :genres)'
+        )
+
+    def _document(self, entity):
+        return {
+            'id': entity.id,
+            'name': entity.name,
+            'city': entity.city,
+            'state': entity.state,
+            'location': f'{entity.city}, {entity.state}',
+            'genres': ' '.join(genre.name for genre in entity.genres)
+        }
+
+
+SEARCH_BACKENDS = {
+    'like': LikeSearchBackend,
+    'postgres': PostgresSearchBackend,
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SqliteSearchBackend,
+}
+
+
+def get_search_backend(db, name=None):
+    """Return the search backend named in config, or the one for the
+    database dialect in use when no name is given."""
+    name = name or db.engine.dialect.name
+    return SEARCH_BACKENDS.get(name, LikeSearchBackend)(db)
@@ -0,0 +1,219 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import jinja2
+from jinja2 import ChoiceLoader, FileSystemBytecodeCache, ModuleLoader
+from flask import current_app, request, session, Response, copy_current_request_context
+from models import db, Venue, Artist
+from search import get_search_backend
+from suggest import PrefixIndex
+from cache import PageCache, FragmentCacheExtension, make_cache_backend
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_backend():
+  # Picked on first use, since choosing by dialect needs the engine
+  extensions = current_app.extensions
+  if 'search' not in extensions:
+    extensions['search'] = get_search_backend(db, current_app.config['SEARCH_BACKEND'])
+  return extensions['search']
+
+def suggest_index():
+  # Built from the venue and artist tables on first use in each worker, then
+  # kept current by the create and delete handlers
+  extensions = current_app.extensions
+  if 'suggest' not in extensions:
+    index = PrefixIndex()
+    index.load('venue', db.session.query(Venue.id, Venue.name))
+    index.load('artist', db.session.query(Artist.id, Artist.name))
+    extensions['suggest'] = index
+  return extensions['suggest']
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+def init_page_cache(app):
+  app.extensions['page_cache'] = PageCache(
+    make_cache_backend(app.config),
+    app.config['PAGE_CACHE_TTL'],
+    stale_ttl=app.config['PAGE_CACHE_STALE_TTL'],
+    lock_timeout=app.config['PAGE_CACHE_LOCK_TIMEOUT']
+  )
+
+def page_cache():
+  return current_app.extensions['page_cache']
+
+def cached_response(cached, status):
+  body, headers = cached
+  response = Response(body, headers=headers)
+  response.headers['X-Cache'] = status
+  return response
+
+def build_page(key, view, args, kwargs):
+  # Render the page and store it when it is the same for every visitor
+  response = current_app.make_response(view(*args, **kwargs))
+  if response.status_code == 200 and not response.is_streamed and not session.modified:
+    page_cache().set(key, (response.get_data(), list(response.headers.items())))
+  return response
+
+def cached_page(view):
+  # Serve anonymous GET pages whole from the page cache. Pages with pending
+  # flash messages, streamed pages and anything that touches the session
+  # are always rendered fresh.
+  #
+  # Only one request per page builds it at a time. A stale page is served
+  # as is while the request holding the lock rebuilds it in a background
+  # thread; on a cold miss the other requests wait for the build instead
+  # of all running the same queries
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    config = current_app.config
+    if not config['PAGE_CACHE_ENABLED'] or request.method != 'GET' or '_flashes' in session:
+      return view(*args, **kwargs)
+
+    cache = page_cache()
+    key = cache.key(request.path, request.args)
+    cached, stale = cache.get(key)
+    if cached is not None and not stale:
+      return cached_response(cached, 'HIT')
+
+    if cache.lock(key):
+      if cached is not None:
+        logger = current_app.logger
+
+        @copy_current_request_context
+        def refresh():
+          try:
+            build_page(key, view, args, kwargs)
+          except Exception:
+            logger.exception('Refreshing %s failed', request.path)
+          finally:
+            cache.unlock(key)
+        threading.Thread(target=refresh, daemon=True).start()
+        return cached_response(cached, 'STALE')
+      try:
+        response = build_page(key, view, args, kwargs)
+      finally:
+        cache.unlock(key)
+      response.headers['X-Cache'] = 'MISS'
+      return response
+
+    if cached is not None:
+      return cached_response(cached, 'STALE')
+    cached = cache.wait(key, config['PAGE_CACHE_WAIT_TIMEOUT'])
+    if cached is not None:
+      return cached_response(cached, 'HIT')
+    # The build stored nothing or is taking too long; render our own copy
+    response = build_page(key, view, args, kwargs)
+    response.headers['X-Cache'] = 'MISS'
+    return response
+
+  return wrapper
+
+def page_path(endpoint, **values):
+  # Same path as request.path, but buildable outside a request (CLI imports)
+  return current_app.url_map.bind('').build(endpoint, values)
+
+def invalidate_show_pages(venue_ids=(), artist_ids=()):
+  # Pages that list shows: /shows, /venues and the affected detail pages
+  page_cache().invalidate(
+    page_path('shows.shows'),
+    page_path('venues.venues'),
+    *[page_path('venues.show_venue', venue_id=venue_id) for venue_id in venue_ids],
+    *[page_path('artists.show_artist', artist_id=artist_id) for artist_id in artist_ids]
+  )
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+def init_fragment_cache(app):
+  app.jinja_env.add_extension(FragmentCacheExtension)
+  if app.config['FRAGMENT_CACHE_ENABLED']:
+    app.jinja_env.fragment_cache = make_cache_backend(
+      app.config, max_entries=app.config['FRAGMENT_CACHE_MAX_ENTRIES'])
+
+def fragment_key(*parts):
+  # Key for a {% cache %} block, built from the ids and row versions of
+  # everything the block shows
+  return ':'.join(str(part) for part in parts)
+
+#----------------------------------------------------------------------------#
+# Compiled templates.
+#----------------------------------------------------------------------------#
+
+BUNDLE_MANIFEST = 'manifest.json'
+
+def template_names(app):
+  # Every page template, read from the sources since a bundle can't list them
+  return sorted(name for name in app.create_global_jinja_loader().list_templates()
+                if name.endswith('.html'))
+
+def templates_digest(app):
+  # Digest of the template sources and of the Jinja version that compiles
+  # them, recorded in a bundle so a bundle of other sources is never used
+  loader = app.create_global_jinja_loader()
+  digest = hashlib.sha1(jinja2.__version__.encode())
+  for name in template_names(app):
+    source, _, _ = loader.get_source(app.jinja_env, name)
+    digest.update(name.encode() + b'\0' + source.encode() + b'\0')
+  return digest.hexdigest()
+
+def init_template_cache(app):
+  # Compiled templates come from the bundle built by flask compile-templates
+  # when it matches the sources, and are otherwise compiled once and kept as
+  # bytecode in TEMPLATE_CACHE_DIR for every later worker. Debug mode
+  # reloads edited templates, so it never uses the bundle
+  env = app.jinja_env
+  if app.config['TEMPLATE_CACHE_ENABLED']:
+    os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+
+  bundle = app.config['TEMPLATE_BUNDLE']
+  if app.debug or not bundle or not os.path.isdir(bundle):
+    return
+  try:
+    with open(os.path.join(bundle, BUNDLE_MANIFEST)) as manifest_file:
+      manifest = json.load(manifest_file)
+  except (OSError, ValueError):
+    manifest = {}
+  if manifest.get('digest') != templates_digest(app):
+    app.logger.warning('Template bundle %s is out of date, compiling the templates instead', bundle)
+    return
+  env.loader = ChoiceLoader([ModuleLoader(bundle), env.loader])
+
+def build_template_bundle(app, target):
+  """Compile every template of app into a bundle of Python modules at
+  target, replacing any bundle already there. Returns the template count."""
+  import compileall
+  import shutil
+
+  names = template_names(app)
+  building = target.rstrip(os.sep) + '.building'
+  shutil.rmtree(building, ignore_errors=True)
+  env = app.jinja_env.overlay(loader=app.create_global_jinja_loader(), bytecode_cache=None)
+  env.compile_templates(building, filter_func=names.__contains__, zip=None, ignore_errors=False)
+  # Byte-compile the modules too, so workers import them without parsing
+  compileall.compile_dir(building, quiet=1)
+  with open(os.path.join(building, BUNDLE_MANIFEST), 'w') as manifest_file:
+    json.dump({'digest': templates_digest(app), 'templates': names}, manifest_file, indent=2)
+  shutil.rmtree(target, ignore_errors=True)
+  os.replace(building, target)
+  return len(names)
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+def stream_requested():
+  # Large listings stream when asked with ?stream=1, or always when
+  # STREAM_LISTINGS is set
+  stream = request.args.get('stream')
+  if stream is None:
+    return current_app.config['STREAM_LISTINGS']
+  return stream.lower() in ('1', 'true', 'yes')
@@ -0,0 +1,142 @@
+import datetime
+import sys
+from flask import Blueprint, current_app, render_template, stream_template, request, flash, url_for, abort
+from models import db, Venue, Artist, Show, record_new_show, refresh_show_counters
+from services import cached_page, invalidate_show_pages, fragment_key, stream_requested
+
+bp = Blueprint('shows', __name__, cli_group=None)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(show):
+  return f'{show.start_time.isoformat()}_{show.id}'
+
+def decode_show_cursor(cursor):
+  # Cursors are the (start_time, id) keyset of a show, see encode_show_cursor()
+  try:
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.datetime.fromisoformat(start_time), int(show_id)
+  except ValueError:
+    abort(400)
+
+def show_tile_details(show):
+  return {
+    'venue_id': show.venue.id,
+    'venue_name': show.venue.name,
+    'artist_id': show.artist.id,
+    'artist_name': show.artist.name,
+    'artist_image_link': show.artist.image_link,
+    'artist_image_key': show.artist.image_key,
+    'start_time': show.start_time,
+    'fragment_key': fragment_key(show.id, show.version, show.venue.version, show.artist.version)
+  }
+
+@bp.route('/shows')
+@cached_page
+def shows():
+  # Get the page window from the request. Pages are keyed on
+  # (start_time, id) so each page is an index range scan, however deep it is
+  scope = request.args.get('scope', 'upcoming')
+  after = request.args.get('after')
+  before = request.args.get('before')
+  page_size = request.args.get('limit', current_app.config['SHOWS_PAGE_SIZE'], type=int)
+  page_size = max(1, min(page_size, current_app.config['SHOWS_MAX_PAGE_SIZE']))
+  current_date_time = datetime.datetime.now()
+
+  # Load each show's venue and artist in the same query as the page
+  query = Show.query.options(db.joinedload(Show.venue), db.joinedload(Show.artist))
+  if scope == 'upcoming':
+    query = query.filter(Show.start_time>=current_date_time)
+  elif scope == 'past':
+    query = query.filter(Show.start_time<current_date_time)
+
+  # In streaming mode render the whole scope unpaginated, reading the shows
+  # through a server-side cursor as the template consumes them
+  if stream_requested():
+    all_shows = query.order_by(Show.start_time, Show.id).yield_per(current_app.config['STREAM_CHUNK_SIZE'])
+    data = (show_tile_details(show) for show in all_shows)
+    return stream_template('pages/shows.html', shows=data, pagination=None)
+
+  # Fetch one row more than the page size to learn whether another page
+  # follows in the direction we are paging
+  keyset = db.tuple_(Show.start_time, Show.id)
+  if before:
+    query = query.filter(keyset<db.tuple_(*decode_show_cursor(before)))
+    page_shows = query.order_by(Show.start_time.desc(), Show.id.desc()).limit(page_size + 1).all()
+    has_more = len(page_shows) > page_size
+    page_shows = page_shows[:page_size][::-1]
+    has_prev, has_next = has_more, True
+  else:
+    if after:
+      query = query.filter(keyset>db.tuple_(*decode_show_cursor(after)))
+    page_shows = query.order_by(Show.start_time, Show.id).limit(page_size + 1).all()
+    has_more = len(page_shows) > page_size
+    page_shows = page_shows[:page_size]
+    has_prev, has_next = bool(after), has_more
+
+  # Build the cursors for the navigation links from the page's end rows
+  pagination = {
+    'prev_url': None,
+    'next_url': None
+  }
+  if page_shows and has_prev:
+    pagination['prev_url'] = url_for('.shows', scope=scope, limit=page_size,
+                                     before=encode_show_cursor(page_shows[0]))
+  if page_shows and has_next:
+    pagination['next_url'] = url_for('.shows', scope=scope, limit=page_size,
+                                     after=encode_show_cursor(page_shows[-1]))
+
+  # Initialize empty data list then populate with show details and add to data list
+  data = []
+  for show in page_shows:
+    data.append(show_tile_details(show))
+
+  return render_template('pages/shows.html', shows=data, pagination=pagination)
+
+@bp.route('/shows/create')
+def create_shows():
+  # renders form. do not touch.
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  import dateutil.parser
+
+  try:
+    artist_id = request.form.get('artist_id')
+    venue_id = request.form.get('venue_id')
+    start_time = dateutil.parser.parse(request.form.get('start_time'))
+
+    new_show = Show(
+      artist_id=artist_id,
+      venue_id=venue_id,
+      start_time=start_time
+    )
+    
+    db.session.add(new_show)
+    record_new_show(new_show)
+    db.session.commit()
+    invalidate_show_pages(venue_ids=[new_show.venue_id], artist_ids=[new_show.artist_id])
+
+    show_id = new_show.id
+    flash(f'Show {new_show.id} was successfully listed!')
+  except:
+    db.session.rollback()
+    flash(f'Show could not be listed.')
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+    
+  return render_template('pages/home.html')
+
+@bp.cli.command('roll-forward-shows')
+def roll_forward_shows():
+  """Move shows that have started out of the upcoming show counters."""
+  # Only rows whose next show is already in the past can have stale counters
+  current_date_time = datetime.datetime.now()
+  for model in (Venue, Artist):
+    refresh_show_counters(model, model.next_show_at<current_date_time)
+  db.session.commit()
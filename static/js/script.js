@@ -2,3 +2,29 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Fill the search box datalists with name completions from /search/suggest
+// as the user types
+document.addEventListener('DOMContentLoaded', function() {
+  var inputs = document.querySelectorAll('input[data-suggest]');
+  Array.prototype.forEach.call(inputs, function(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var kind = input.getAttribute('data-suggest');
+    var pending;
+    input.addEventListener('input', function() {
+      clearTimeout(pending);
+      pending = setTimeout(function() {
+        fetch('/search/suggest?q=' + encodeURIComponent(input.value))
+          .then(function(response) { return response.json(); })
+          .then(function(results) {
+            list.innerHTML = '';
+            results[kind].forEach(function(result) {
+              var option = document.createElement('option');
+              option.value = result.name;
+              list.appendChild(option);
+            });
+          });
+      }, 100);
+    });
+  });
+});
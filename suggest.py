@@ -0,0 +1,72 @@
+import threading
+from bisect import bisect_left, insort
+
+
+class PrefixIndex:
+    """In-memory prefix index over venue and artist names.
+
+    Entries are kept in a sorted list of ``(key, kind, id, name)`` tuples
+    with one entry per word of each name, so "hop" completes "The Musical
+    Hop". Lookups bisect to the first key with the prefix and scan forward.
+
+    Writers copy the list and swap it in under a lock, so readers never
+    block. The index lives in each worker process and only sees the changes
+    that worker makes; it is rebuilt from the database on startup.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._lock = threading.Lock()
+
+    def load(self, kind, rows):
+        """Replace every entry of kind with the given (id, name) rows."""
+        with self._lock:
+            entries = [entry for entry in self._entries if entry[1] != kind]
+            for entity_id, name in rows:
+                entries.extend(self._entries_for(kind, entity_id, name))
+            entries.sort()
+            self._entries = entries
+
+    def add(self, kind, entity_id, name):
+        with self._lock:
+            entries = list(self._entries)
+            for entry in self._entries_for(kind, entity_id, name):
+                insort(entries, entry)
+            self._entries = entries
+
+    def remove(self, kind, entity_id):
+        with self._lock:
+            self._entries = [
+                entry for entry in self._entries
+                if entry[1] != kind or entry[2] != entity_id
+            ]
+
+    def complete(self, prefix, kind=None, limit=10):
+        """Return up to limit (id, name) pairs whose name has a word
+        starting with prefix, optionally restricted to one kind."""
+        prefix = prefix.strip().casefold()
+        if not prefix or limit <= 0:
+            return []
+
+        entries = self._entries
+        results = []
+        seen = set()
+        for position in range(bisect_left(entries, (prefix,)), len(entries)):
+            key, entry_kind, entity_id, name = entries[position]
+            if not key.startswith(prefix):
+                break
+            if (kind is not None and entry_kind != kind) or (entry_kind, entity_id) in seen:
+                continue
+            seen.add((entry_kind, entity_id))
+            results.append((entity_id, name))
+            if len(results) == limit:
+                break
+        return results
+
+    def _entries_for(self, kind, entity_id, name):
+        # One key per word, running from that word to the end of the name
+        words = name.casefold().split()
+        return [
+            (' '.join(words[position:]), kind, entity_id, name)
+            for position in range(len(words))
+        ]
@@ -0,0 +1,72 @@
+import datetime
+import os
+
+import pytest
+
+os.environ.setdefault('FYYUR_ENV', 'testing')
+
+from app import create_app  # noqa: E402
+from models import db as _db, Genre, Venue, Artist, Show  # noqa: E402
+
+GENRES = ['Blues', 'Folk', 'Jazz', 'Rock n Roll']
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Settings for the app under test; tests adjust them before using app."""
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "fyyur.sqlite"}',
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'PAGE_CACHE_ENABLED': False,
+        'PAGE_CACHE_DIR': str(tmp_path / 'page_cache'),
+        'FRAGMENT_CACHE_ENABLED': False,
+        'TEMPLATE_CACHE_ENABLED': False,
+        'ASSET_BUILD_ENABLED': False,
+        'IMAGE_STORE_DIR': str(tmp_path / 'media'),
+        'IMAGE_CACHE_DIR': str(tmp_path / 'image_cache'),
+    }
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        _db.create_all()
+        _db.session.add_all([Genre(name=name) for name in GENRES])
+        _db.session.commit()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+        _db.engine.dispose()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def catalog(db):
+    """Two venues and two artists, with shows every day from five days ago
+    to five days ahead, alternating between them."""
+    venues = [Venue(name=f'Venue {index}', city='Austin', state='TX', address='1 Main St')
+              for index in range(2)]
+    artists = [Artist(name=f'Artist {index}', city='Austin', state='TX') for index in range(2)]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+    now = datetime.datetime.now().replace(microsecond=0)
+    shows = [Show(venue=venues[day % 2], artist=artists[day % 2], start_time=now + datetime.timedelta(days=day))
+             for day in range(-5, 6)]
+    db.session.add_all(shows)
+    db.session.commit()
+    from models import refresh_show_counters
+    refresh_show_counters(Venue)
+    refresh_show_counters(Artist)
+    db.session.commit()
+    return {'venues': venues, 'artists': artists, 'shows': shows}
@@ -0,0 +1,97 @@
+import datetime
+
+from models import Venue, Artist, Show, table_version
+
+
+def etag_round_trip(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    repeated = client.get(url, headers={'If-None-Match': etag})
+    assert repeated.status_code == 304
+    assert repeated.data == b''
+    assert repeated.headers['ETag'] == etag
+    return etag
+
+
+def test_collections_answer_304_until_they_change(client, db, catalog):
+    for url in ('/api/v1/venues', '/api/v1/artists', '/api/v1/shows', '/api/v1/shows?scope=past'):
+        etag_round_trip(client, url)
+
+    etag = etag_round_trip(client, '/api/v1/venues')
+    catalog['venues'][0].name = 'Renamed'
+    db.session.commit()
+    response = client.get('/api/v1/venues', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['data'][0]['name'] == 'Renamed'
+
+
+def test_request_arguments_are_part_of_the_etag(client, catalog):
+    first = etag_round_trip(client, '/api/v1/venues?limit=1')
+    assert client.get('/api/v1/venues?limit=2', headers={'If-None-Match': first}).status_code == 200
+
+
+def test_show_collection_covers_its_venues(client, db, catalog):
+    etag = etag_round_trip(client, '/api/v1/shows')
+    catalog['venues'][1].name = 'Renamed'
+    db.session.commit()
+    response = client.get('/api/v1/shows', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Renamed' in {show['venue_name'] for show in response.json['data']}
+
+
+def test_bulk_writes_change_the_table_version(db, catalog):
+    before = table_version(Venue), table_version(Artist)
+    Venue.query.filter(Venue.id == catalog['venues'][0].id).update(
+        {Venue.city: 'Dallas'}, synchronize_session=False)
+    db.session.commit()
+    assert table_version(Venue) != before[0]
+    assert table_version(Artist) == before[1]
+
+
+def test_deletes_change_the_table_version(db, catalog):
+    before = table_version(Show)
+    db.session.delete(catalog['shows'][-1])
+    db.session.commit()
+    assert table_version(Show) != before
+
+
+def test_detail_answers_304_and_never_writes(client, db, catalog):
+    venue = catalog['venues'][0]
+    # Counters left stale by a show that has started since they were taken
+    venue.next_show_at = datetime.datetime.now() - datetime.timedelta(hours=1)
+    db.session.commit()
+    version = venue.version
+
+    etag = etag_round_trip(client, f'/api/v1/venues/{venue.id}')
+    db.session.expire_all()
+    assert Venue.query.get(venue.id).version == version
+
+    # A show starting moves it to the past shows, which changes the ETag
+    upcoming = Show.query.filter(Show.venue_id == venue.id, Show.start_time >= datetime.datetime.now()) \
+        .order_by(Show.start_time).first()
+    db.session.execute(Show.__table__.update().where(Show.id == upcoming.id).values(
+        start_time=datetime.datetime.now() - datetime.timedelta(minutes=1)))
+    db.session.commit()
+    assert client.get(f'/api/v1/venues/{venue.id}', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_missing_rows_are_404(client, catalog):
+    assert client.get('/api/v1/venues/999').status_code == 404
+    assert client.get('/api/v1/shows/999').status_code == 404
+
+
+def test_detail_covers_the_counterparts_of_its_shows(client, db, catalog):
+    venue, artist = catalog['venues'][0], catalog['artists'][0]
+    etag = etag_round_trip(client, f'/api/v1/venues/{venue.id}')
+
+    artist.image_key = 'a' * 40
+    db.session.commit()
+    response = client.get(f'/api/v1/venues/{venue.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert {show['artist_image_key'] for show in response.json['upcoming_shows']} == {'a' * 40}
+
+    artist_etag = etag_round_trip(client, f'/api/v1/artists/{artist.id}')
+    venue.name = 'Renamed'
+    db.session.commit()
+    assert client.get(f'/api/v1/artists/{artist.id}', headers={'If-None-Match': artist_etag}).status_code == 200
@@ -0,0 +1,32 @@
+from genres import GenreCache
+from models import Genre, genre_cache
+
+
+def test_choices_keep_the_form_order(db):
+    db.session.add_all([Genre(name='Other'), Genre(name='Hip-Hop'), Genre(name='Heavy Metal'),
+                        Genre(name='Zydeco')])
+    db.session.commit()
+    assert [value for value, label in genre_cache().choices()] == [
+        'Blues', 'Folk', 'Hip-Hop', 'Heavy Metal', 'Jazz', 'Rock n Roll', 'Zydeco', 'Other']
+
+
+def test_committed_genre_changes_drop_the_cache(db):
+    assert 'Soul' not in genre_cache().ids()
+    db.session.add(Genre(name='Soul'))
+    db.session.commit()
+    assert 'Soul' in genre_cache().ids()
+
+
+def test_cache_reloads_after_its_ttl(monkeypatch):
+    rows = [('Blues', 1)]
+    cache = GenreCache(lambda: list(rows), ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr('genres.time.monotonic', lambda: clock[0])
+    assert cache.ids() == {'Blues': 1}
+
+    # Another process adds a genre; this copy is only dropped by its ttl
+    rows.append(('Jazz', 2))
+    clock[0] += 59
+    assert 'Jazz' not in cache.ids()
+    clock[0] += 1
+    assert cache.ids() == {'Blues': 1, 'Jazz': 2}
@@ -0,0 +1,108 @@
+import os
+import threading
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from imaging import allowed_widths, render_derivative, render_once, ingest_image  # noqa: E402
+
+
+def write_jpeg(path, size, orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, 'red').save(path, 'JPEG', exif=exif.tobytes())
+    return str(path)
+
+
+def test_allowed_widths_stop_at_the_original(app):
+    assert allowed_widths(('v', 4000, 3000), (320, 960, 1920)) == [320, 960, 1920]
+    assert allowed_widths(('v', 1000, 750), (320, 960, 1920)) == [320, 960, 1000]
+    assert allowed_widths(('v', 960, 720), (320, 960, 1920)) == [320, 960]
+    assert allowed_widths(('v', 200, 100), (320, 960)) == [200]
+
+
+def test_render_derivative_keeps_the_aspect_ratio(app, tmp_path):
+    source = write_jpeg(tmp_path / 'wide.jpg', (4000, 3000))
+    target = str(tmp_path / 'out' / '960.jpeg')
+    render_derivative(source, target, 960, 'jpeg')
+    with Image.open(target) as image:
+        assert image.size == (960, 720)
+
+
+def test_render_derivative_applies_the_exif_orientation(app, tmp_path):
+    # Stored 4000x3000, shown a quarter turn round as 3000x4000
+    source = write_jpeg(tmp_path / 'rotated.jpg', (4000, 3000), orientation=6)
+    target = str(tmp_path / 'out' / '960.jpeg')
+    render_derivative(source, target, 960, 'jpeg')
+    with Image.open(target) as image:
+        assert image.size == (960, 1280)
+
+
+def test_render_derivative_never_upscales(app, tmp_path):
+    source = write_jpeg(tmp_path / 'small.jpg', (200, 100))
+    target = str(tmp_path / 'out' / '320.jpeg')
+    render_derivative(source, target, 320, 'jpeg')
+    with Image.open(target) as image:
+        assert image.size == (200, 100)
+
+
+def test_render_once_renders_each_target_once(app, tmp_path, monkeypatch):
+    source = write_jpeg(tmp_path / 'wide.jpg', (400, 300))
+    target = str(tmp_path / 'out' / '320.jpeg')
+    calls = []
+    original = render_derivative
+
+    def counting(*args):
+        calls.append(args)
+        original(*args)
+
+    def request():
+        with app.app_context():
+            results.append(render_once(source, target, 320, 'jpeg', 60))
+
+    monkeypatch.setattr('imaging.render_derivative', counting)
+    results = []
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [False] * 7 + [True]
+    assert not os.path.exists(target + '.lock')
+
+
+def test_render_once_takes_over_a_stale_lock(app, tmp_path):
+    source = write_jpeg(tmp_path / 'wide.jpg', (400, 300))
+    target = str(tmp_path / 'out' / '320.jpeg')
+    os.makedirs(os.path.dirname(target))
+    open(target + '.lock', 'w').close()
+    os.utime(target + '.lock', (0, 0))
+    assert render_once(source, target, 320, 'jpeg', 60)
+    assert os.path.exists(target)
+
+
+def test_derivative_route_serves_the_resized_copy(app, client, tmp_path):
+    key = ingest_image(write_jpeg(tmp_path / 'venue.jpg', (1000, 750)))
+    response = client.get(f'/images/store/jpeg/640/{key}?v={key[:12]}')
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert client.get(f'/images/store/jpeg/1280/{key}').status_code == 404
+
+
+def test_ingesting_an_image_invalidates_the_counterpart_pages(app, db, catalog, tmp_path, monkeypatch):
+    originals = tmp_path / 'originals'
+    originals.mkdir()
+    write_jpeg(originals / 'artist.jpg', (400, 300))
+    artist = catalog['artists'][0]
+    artist.image_link = 'https://example.com/images/artist.jpg'
+    db.session.commit()
+    invalidated = []
+    monkeypatch.setattr('images.invalidate_show_pages',
+                        lambda venue_ids, artist_ids: invalidated.append((set(venue_ids), set(artist_ids))))
+
+    result = app.test_cli_runner().invoke(args=['ingest-images', str(originals)])
+    assert result.exit_code == 0, result.output
+    assert invalidated == [({catalog['venues'][0].id}, {artist.id})]
@@ -0,0 +1,84 @@
+import io
+
+from importer import import_file
+from models import Show, Venue
+from querystats import count_queries
+from services import search_backend
+
+
+def run_import(kind, text, format='csv'):
+    return import_file(kind, io.StringIO(text), format)
+
+
+def test_venues_import_with_genres(db):
+    report = run_import('venues', (
+        'name,city,state,address,phone,website,facebook_link,genres\n'
+        'The Room,Austin,TX,1 Main St,555-555-5555,https://room.example,https://facebook.com/room,"Jazz, Blues"\n'
+        ',Austin,TX,1 Main St,555-555-5555,https://room.example,https://facebook.com/room,Jazz\n'
+    ))
+    assert (report.imported, report.failed) == (1, 1)
+    assert report.errors[0]['line'] == 3 and 'name' in report.errors[0]['errors']
+    venue = db.session.query(Venue).one()
+    assert sorted(genre.name for genre in venue.genres) == ['Blues', 'Jazz']
+
+
+def venue_rows(count):
+    return 'name,city,state,address,phone,website,facebook_link,genres\n' + ''.join(
+        f'Cellar {index},Austin,TX,1 Main St,555-555-5555,https://cellar.example,'
+        f'https://facebook.com/cellar,"Jazz, Folk"\n' for index in range(count))
+
+
+def test_imported_venues_are_indexed_in_one_batch_per_chunk(db):
+    # The first search builds the search table, which imports then keep current
+    search_backend().search(Venue, 'cellar')
+    with count_queries() as stats:
+        run_import('venues', venue_rows(20))
+    search_statements = [times for statement, times in stats.statements.items()
+                         if 'venue_search' in statement or 'sqlite_master' in statement]
+    assert search_statements == [1, 1, 1]
+    # No genres lazy loaded per venue
+    assert not [statement for statement in stats.statements if 'FROM genre, venue_genres' in statement]
+
+    assert search_backend().search(Venue, 'cellar')[0] == 20
+    assert search_backend().search(Venue, 'folk')[0] == 20
+
+
+def test_show_without_start_time_fails(catalog, db):
+    venue_id, artist_id = catalog['venues'][0].id, catalog['artists'][0].id
+    before = db.session.query(Show).count()
+    report = run_import('shows', (
+        'venue_id,artist_id,start_time\n'
+        f'{venue_id},{artist_id},\n'
+        f'{venue_id},{artist_id},   \n'
+        f'{venue_id},{artist_id},2030-01-01 20:00:00\n'
+    ))
+    assert (report.imported, report.failed) == (1, 2)
+    assert [error['errors'] for error in report.errors] == [{'start_time': ['This field is required.']}] * 2
+    assert db.session.query(Show).count() == before + 1
+
+
+def test_show_with_absent_start_time_column_fails(catalog, db):
+    report = run_import('shows', f'{{"venue_id": {catalog["venues"][0].id}, '
+                                 f'"artist_id": {catalog["artists"][0].id}}}\n', 'jsonl')
+    assert (report.imported, report.failed) == (0, 1)
+    assert 'start_time' in report.errors[0]['errors']
+
+
+def test_show_references_are_checked(catalog):
+    report = run_import('shows', (
+        'venue_id,artist_id,start_time\n'
+        f'999,{catalog["artists"][0].id},2030-01-01 20:00:00\n'
+        f'x,{catalog["artists"][0].id},2030-01-01 20:00:00\n'
+    ))
+    assert report.failed == 2
+    assert report.errors[0]['errors'] == {'venue_id': ['No such record.']}
+    assert report.errors[1]['errors'] == {'venue_id': ['Not a valid id.']}
+
+
+def test_only_the_first_errors_are_kept(db):
+    rows = 'name,city,state,address\n' + ',Austin,TX,1 Main St\n' * 5
+    report = import_file('venues', io.StringIO(rows), 'csv', max_errors=2)
+    assert report.failed == 5
+    assert [error['line'] for error in report.errors] == [2, 3]
+    assert report.errors_omitted == 3
+    assert report.to_dict()['errors_omitted'] == 3
@@ -0,0 +1,106 @@
+import importlib
+import os
+import pickle
+import threading
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import config as settings
+from cache import FileSystemCache
+from services import page_cache
+
+
+@pytest.fixture
+def config(config):
+    config.update(PAGE_CACHE_ENABLED=True, PAGE_CACHE_BACKEND='filesystem')
+    return config
+
+
+def test_pages_are_served_from_the_cache_until_invalidated(client, db, catalog):
+    first = client.get('/venues')
+    assert first.headers['X-Cache'] == 'MISS'
+    cached = client.get('/venues')
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert cached.data == first.data
+
+    # Arguments are part of the key
+    assert client.get('/venues?page=2').headers['X-Cache'] == 'MISS'
+
+    client.post('/venues/create', data={
+        'name': 'New Venue', 'city': 'Austin', 'state': 'TX', 'address': '3 Main St', 'genres': ['Jazz'],
+    })
+    refreshed = client.get('/venues')
+    assert refreshed.headers['X-Cache'] == 'MISS'
+    assert b'New Venue' in refreshed.data
+
+
+def test_stale_pages_are_served_while_one_request_rebuilds(app, client, catalog):
+    cache = page_cache()
+    assert client.get('/venues').headers['X-Cache'] == 'MISS'
+    # Everything stored from now on is stale straight away
+    cache.ttl = 0
+    key = cache.key('/venues', MultiDict())
+    cache.set(key, cache.get(key)[0])
+
+    stale = client.get('/venues')
+    assert stale.headers['X-Cache'] == 'STALE'
+    # Wait for the background rebuild to finish and release its lock
+    cache.wait(key, 5)
+    assert cache.backend.get(f'lock:{key}') is None
+
+
+def test_pages_with_flashes_bypass_the_cache(client, catalog):
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Hello')]
+    response = client.get('/venues')
+    assert 'X-Cache' not in response.headers
+
+
+def test_filesystem_add_is_atomic(tmp_path):
+    backend = FileSystemCache(str(tmp_path))
+    results = []
+    threads = [threading.Thread(target=lambda index=index: results.append(backend.add('lock', index, 30)))
+               for index in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results.count(True) == 1
+    assert backend.get('lock') is not None
+    # Only the entry itself is left behind
+    assert [name for name in os.listdir(tmp_path)] == [os.path.basename(backend._path('lock'))]
+
+
+def test_filesystem_add_never_shows_a_partial_entry(tmp_path, monkeypatch):
+    backend = FileSystemCache(str(tmp_path))
+    seen = []
+    dump = pickle.dump
+
+    def watching_dump(*args):
+        # What a concurrent get() would see while the entry is written
+        seen.append(os.path.exists(backend._path('lock')))
+        dump(*args)
+
+    monkeypatch.setattr('cache.pickle.dump', watching_dump)
+    assert backend.add('lock', True, 30)
+    assert seen == [False]
+
+
+def test_filesystem_add_replaces_expired_entries(tmp_path):
+    backend = FileSystemCache(str(tmp_path))
+    backend.set('lock', 'old', ttl=-1)
+    assert backend.add('lock', 'new', 30)
+    assert backend.get('lock') == 'new'
+    assert not backend.add('lock', 'newer', 30)
+
+
+@pytest.mark.parametrize('workers, backend', [('1', 'memory'), ('5', 'filesystem')])
+def test_several_workers_share_a_page_cache_by_default(monkeypatch, workers, backend):
+    monkeypatch.setenv('WEB_CONCURRENCY', workers)
+    monkeypatch.delenv('PAGE_CACHE_BACKEND', raising=False)
+    try:
+        assert importlib.reload(settings).PAGE_CACHE_BACKEND == backend
+    finally:
+        monkeypatch.undo()
+        importlib.reload(settings)
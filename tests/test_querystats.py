@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+
+from models import Show
+from querystats import QueryBudgetExceeded, count_queries, query_budget
+
+
+def test_venues_listing_fits_its_budget(client, catalog):
+    with query_budget(1) as stats:
+        response = client.get('/venues')
+    assert response.status_code == 200
+    assert b'Venue 0' in response.data
+    assert stats.count == 1
+    assert 'db;dur=' in response.headers['Server-Timing']
+
+
+def test_exceeding_the_budget_names_the_statements(client, catalog):
+    with pytest.raises(QueryBudgetExceeded) as failure:
+        with query_budget(0):
+            client.get('/venues')
+    assert '1 queries run, budget is 0' in str(failure.value)
+    assert 'in venues)' in str(failure.value)
+
+
+def test_repeated_statements_are_reported_with_their_call_site(app, db, catalog):
+    db.session.expunge_all()
+    with count_queries() as stats:
+        for show in Show.query.all():
+            show.venue.name  # lazy loads each venue
+    (statement, times, call_site), = stats.repeated(2)
+    assert 'FROM venue' in statement
+    assert times == 2
+    assert call_site.startswith('tests/test_querystats.py:')
+
+
+def test_requests_log_probable_n_plus_one(app, client, catalog, caplog):
+    def venue_names():
+        return ', '.join(show.venue.name for show in Show.query.all())
+    app.add_url_rule('/venue-names', view_func=venue_names)
+    # Two venues, so two lazy loads of the same shape
+    app.config['QUERY_REPEAT_THRESHOLD'] = 2
+
+    with caplog.at_level(logging.INFO, logger=app.logger.name):
+        client.get('/venue-names')
+    warnings = [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert warnings[0].startswith('Probable N+1 on /venue-names: 2x from tests/test_querystats.py:')
+
+
+def test_streamed_responses_are_counted_until_closed(app, client, catalog, caplog):
+    with caplog.at_level(logging.INFO, logger=app.logger.name):
+        response = client.get('/shows?stream=1')
+        assert response.is_streamed
+        body = response.get_data()
+        response.close()
+    assert b'Venue 0' in body
+    logged = [record.getMessage() for record in caplog.records if record.getMessage().startswith('GET /shows')]
+    assert len(logged) == 1
+    assert not logged[0].startswith('GET /shows: 0 queries')
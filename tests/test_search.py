@@ -0,0 +1,50 @@
+import pytest
+
+from models import Genre, Venue, venue_genres
+from search import PostgresSearchBackend, SqliteSearchBackend
+
+
+@pytest.fixture
+def venues(db):
+    venues = [Venue(name=f'Jazz Cellar {index}', city='Austin', state='TX', address='1 Main St')
+              for index in range(5)]
+    venues.append(Venue(name='Folk Hall', city='Dallas', state='TX', address='2 Main St'))
+    db.session.add_all(venues)
+    db.session.commit()
+    return venues
+
+
+def test_sqlite_backend_pages_in_sql(db, venues):
+    backend = SqliteSearchBackend(db)
+    count, everything = backend.search(Venue, 'jazz')
+    assert count == 5
+    assert {venue.name for venue in everything} == {f'Jazz Cellar {index}' for index in range(5)}
+
+    count, page = backend.search(Venue, 'jazz', limit=2, offset=2)
+    assert count == 5
+    assert page == everything[2:4]
+
+    assert backend.search(Venue, 'jazz', limit=2, offset=4) == (5, everything[4:])
+    assert backend.search(Venue, 'jazz', limit=2, offset=10) == (5, [])
+
+
+def test_sqlite_backend_falls_back_to_like_for_short_terms(db, venues):
+    count, matches = SqliteSearchBackend(db).search(Venue, 'fo')
+    assert count == 1
+    assert matches[0].name == 'Folk Hall'
+
+
+def test_postgres_matcher_finds_every_searched_field(db, venues):
+    folk = Genre.query.filter_by(name='Folk').one()
+    db.session.execute(venue_genres.insert(), [{'venue_id': venues[0].id, 'genre_id': folk.id}])
+    db.session.commit()
+    matches = PostgresSearchBackend(db)._matches
+
+    def names(term):
+        return sorted(venue.name for venue in Venue.query.filter(matches(Venue, term)))
+
+    assert names('cellar 3') == ['Jazz Cellar 3']
+    assert names('dallas') == ['Folk Hall']
+    assert names('austin, tx') == [f'Jazz Cellar {index}' for index in range(5)]
+    assert names('tx') == sorted(venue.name for venue in venues)
+    assert names('fol') == ['Folk Hall', 'Jazz Cellar 0']
@@ -0,0 +1,100 @@
+import datetime
+from contextlib import contextmanager
+
+import pytest
+from flask import template_rendered
+
+from models import Show
+
+
+@contextmanager
+def rendered_pages(app):
+    pages = []
+
+    def record(sender, template, context, **extra):
+        pages.append(context)
+    template_rendered.connect(record, app)
+    try:
+        yield pages
+    finally:
+        template_rendered.disconnect(record, app)
+
+
+def get_page(app, client, url):
+    with rendered_pages(app) as pages:
+        response = client.get(url)
+    assert response.status_code == 200
+    context, = pages
+    return context['shows'], context['pagination']
+
+
+def walk(app, client, url, direction):
+    # Follow the direction's links from url, returning every page's shows
+    pages = []
+    while url:
+        shows, pagination = get_page(app, client, url)
+        pages.append(shows)
+        url = pagination[direction]
+    return pages
+
+
+@pytest.fixture
+def tied(db, catalog):
+    # Two more shows starting at the same time as the first, so pages have
+    # to break ties on the show id
+    first = catalog['shows'][0]
+    shows = [Show(venue_id=first.venue_id, artist_id=first.artist_id, start_time=first.start_time)
+             for _ in range(2)]
+    db.session.add_all(shows)
+    db.session.commit()
+    return Show.query.order_by(Show.start_time, Show.id).all()
+
+
+def keys(shows):
+    return [(show['start_time'], show['venue_id'], show['artist_id']) for show in shows]
+
+
+def test_pages_cover_every_show_once_in_both_directions(app, client, tied):
+    expected = [(show.start_time, show.venue_id, show.artist_id) for show in tied]
+
+    forward = walk(app, client, '/shows?scope=all&limit=4', 'next_url')
+    assert [len(page) for page in forward] == [4, 4, 4, 1]
+    assert [key for page in forward for key in keys(page)] == expected
+
+    # Walking back from the last page gives the same pages in reverse
+    last_url = get_page(app, client, '/shows?scope=all&limit=4')[1]['next_url']
+    while True:
+        next_url = get_page(app, client, last_url)[1]['next_url']
+        if next_url is None:
+            break
+        last_url = next_url
+    backward = walk(app, client, last_url, 'prev_url')
+    assert [keys(page) for page in backward] == [keys(page) for page in reversed(forward)]
+
+
+def test_first_and_last_pages_have_no_link_past_the_end(app, client, catalog):
+    shows, pagination = get_page(app, client, '/shows?scope=all&limit=11')
+    assert len(shows) == 11
+    assert pagination == {'prev_url': None, 'next_url': None}
+
+    # A page ending exactly on the last show has no next page
+    shows, pagination = get_page(app, client, '/shows?scope=all&limit=10')
+    assert pagination['prev_url'] is None
+    shows, pagination = get_page(app, client, pagination['next_url'])
+    assert len(shows) == 1
+    assert pagination['next_url'] is None
+    assert pagination['prev_url'] is not None
+
+
+def test_scopes_split_at_now(app, client, catalog):
+    now = datetime.datetime.now()
+    upcoming, _ = get_page(app, client, '/shows?limit=50')
+    past, _ = get_page(app, client, '/shows?scope=past&limit=50')
+    assert len(upcoming) + len(past) == 11
+    assert all(show['start_time'] >= now for show in upcoming)
+    assert all(show['start_time'] < now for show in past)
+
+
+def test_bad_cursors_are_rejected(client, catalog):
+    assert client.get('/shows?after=yesterday').status_code == 400
+    assert client.get('/shows?before=2020-01-01T00:00:00_x').status_code == 400
@@ -0,0 +1,27 @@
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import Venue, Show
+
+
+def test_delete_removes_the_venue_and_its_shows(client, db, catalog):
+    venue_id = catalog['venues'][0].id
+    response = client.delete(f'/venues/{venue_id}')
+    assert response.status_code == 200
+    assert response.json == {'success': True, 'redirect': '/'}
+    assert Venue.query.get(venue_id) is None
+    assert Show.query.filter_by(venue_id=venue_id).count() == 0
+    assert client.delete(f'/venues/{venue_id}').status_code == 404
+
+
+def test_delete_racing_a_write_is_reported(client, db, catalog, monkeypatch):
+    def racing_write(*args, **kwargs):
+        raise StaleDataError('venue was changed meanwhile')
+    monkeypatch.setattr('venues.refresh_show_counters', racing_write)
+
+    venue_id = catalog['venues'][0].id
+    response = client.delete(f'/venues/{venue_id}')
+    assert response.status_code == 409
+    assert response.json == {'success': False}
+    with client.session_transaction() as session:
+        assert session['_flashes'] == [('message', 'Venue could not be deleted, please try again.')]
+    assert Venue.query.get(venue_id) is not None
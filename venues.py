@@ -0,0 +1,252 @@
+import hashlib
+import sys
+from itertools import groupby
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+from models import (db, Venue, Artist, Show, venue_genres, add_genres, refresh_show_counters,
+                    query_past_upcoming_shows)
+from services import (search_backend, suggest_index, cached_page, page_cache, page_path,
+                      invalidate_show_pages, fragment_key)
+
+bp = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@cached_page
+def venues():
+  # Get every venue with its upcoming show counter in one query. Ordering
+  # by state then city keeps venues in the same area adjacent
+  venue_rows = db.session.query(
+                  Venue.id,
+                  Venue.name,
+                  Venue.city,
+                  Venue.state,
+                  Venue.upcoming_show_count,
+                  Venue.version
+                ).order_by(Venue.state, Venue.city, Venue.id).all()
+
+  # Build the data structure expected by the view in a single pass, starting
+  # a new area whenever the city/state pair changes
+  data = []
+  for (city, state), area_venues in groupby(venue_rows, key=lambda row: (row.city, row.state)):
+    venues_list = []
+    area_versions = []
+    for venue_detail in area_venues:
+      area_versions.append((venue_detail.id, venue_detail.version))
+      venue = {
+        'id': venue_detail.id,
+        'name': venue_detail.name,
+        'num_upcoming_shows': venue_detail.upcoming_show_count
+      }
+      venues_list.append(venue)
+
+    data.append({
+      'city': city,
+      'state': state,
+      'venues': venues_list,
+      'fragment_key': fragment_key(city, state, hashlib.sha1(repr(area_versions).encode()).hexdigest())
+    })
+
+  return render_template('pages/venues.html', areas=data)
+
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+  # Get search term and run it through the search backend, which matches
+  # name, city, state and genre and returns results ranked best first
+  search_term = request.form.get('search_term', '')
+  count_of_results, search_results = search_backend().search(Venue, search_term)
+  
+  # Initialize the data list and step through each result to retrieve needed data
+  data = []
+  for venue in search_results:
+    venue_details = {
+      'id': venue.id,
+      'name': venue.name,
+      'num_upcoming_shows': venue.upcoming_show_count
+    }
+    data.append(venue_details)
+  
+  # Build the response dictionary the view is expecting
+  response = {
+    'count': count_of_results,
+    'data': data
+  }
+
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/venues/<int:venue_id>')
+@cached_page
+def show_venue(venue_id):
+  # Query db for venue with its genres loaded alongside it
+  venue_details = Venue.query.options(db.joinedload(Venue.genres)).get(venue_id)
+  
+  # If the venue provided to the endpoint does not exist, return to venue list
+  if not venue_details:
+    return redirect(url_for('.venues'))
+
+  return render_template('pages/show_venue.html', venue=venue_page_data(venue_details))
+
+def venue_page_data(venue_details):
+  venue_id = venue_details.id
+
+  # Construct past/future shows details, with each show's artist loaded in
+  # the same query
+  past_shows = []
+  upcoming_shows = []
+  for shows_list, shows in zip((past_shows, upcoming_shows),
+                               query_past_upcoming_shows(Show.venue_id, venue_id, Show.artist)):
+    for show in shows:
+      shows_list.append({
+        'artist_id': show.artist_id,
+        'artist_name': show.artist.name,
+        'artist_image_link': show.artist.image_link,
+        'artist_image_key': show.artist.image_key,
+        'start_time': show.start_time,
+        'fragment_key': fragment_key(show.id, show.version, show.artist.version)
+      })
+
+  # Get genre list for venue
+  genre_list = []
+  for genre in venue_details.genres:
+    genre_list.append(genre.name)
+
+  # Construct data dictionary expected by view
+  data = {
+    'id': venue_details.id,
+    'name': venue_details.name,
+    'genres': genre_list,
+    'address': venue_details.address,
+    'city': venue_details.city,
+    'state': venue_details.state,
+    'phone': venue_details.phone,
+    'website': venue_details.website,
+    'facebook_link': venue_details.facebook_link,
+    'seeking_talent': venue_details.seeking_talent,
+    'seeking_description': venue_details.seeking_description,
+    'image_link': venue_details.image_link,
+    'image_key': venue_details.image_key,
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': len(past_shows),
+    'upcoming_shows_count': len(upcoming_shows)
+  }
+
+  return data
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  # Get data from form and attempt to create record
+  try:
+    name = request.form.get('name')
+    city = request.form.get('city')
+    state = request.form.get('state')
+    address = request.form.get('address')
+    phone = request.form.get('phone')
+    seeking_talent = request.form.get('seeking_talent')
+    seeking_description = request.form.get('seeking_description')
+    image_link = request.form.get('image_link')
+    website = request.form.get('website')
+    facebook_link = request.form.get('facebook_link')
+    
+    if seeking_talent == 'y':
+      seeking_talent = True
+    elif seeking_talent == 'n':
+      seeking_talent = False
+
+    new_venue = Venue(
+      name=name,
+      city=city,
+      state=state,
+      address=address,
+      phone=phone,
+      seeking_talent=seeking_talent,
+      seeking_description=seeking_description,
+      image_link=image_link,
+      website=website,
+      facebook_link=facebook_link
+    )
+
+    db.session.add(new_venue)
+    db.session.flush()
+    add_genres(venue_genres, 'venue_id', new_venue.id, request.form.getlist('genres'))
+    search_backend().index(new_venue)
+    db.session.commit()
+    suggest_index().add('venue', new_venue.id, new_venue.name)
+    page_cache().invalidate(page_path('venues.venues'))
+    flash(f'Venue {name} was successfully listed!')
+  except: # In the event of a record add error, rollback the transaction and flash error
+    db.session.rollback()
+    flash(f'Venue {name} could not be listed.')
+    print(sys.exc_info())
+  finally:
+    db.session.close()
+  
+  return render_template('pages/home.html')
+
+@bp.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # Use the venue id to query the venue and delete the record along with
+  # its shows, then recompute the counters of the artists that played there
+  venue = Venue.query.get_or_404(venue_id)
+  try:
+    artist_ids = {show.artist_id for show in venue.shows}
+    search_backend().remove(venue)
+    db.session.delete(venue)
+    db.session.flush()
+    if artist_ids:
+      refresh_show_counters(Artist, Artist.id.in_(artist_ids))
+    db.session.commit()
+  except SQLAlchemyError: # A show added or a venue changed meanwhile raises StaleDataError
+    db.session.rollback()
+    print(sys.exc_info())
+    flash('Venue could not be deleted, please try again.')
+    return jsonify({'success': False}), 409
+  finally:
+    db.session.close()
+
+  suggest_index().remove('venue', venue_id)
+  invalidate_show_pages(venue_ids=[venue_id], artist_ids=artist_ids)
+  flash('Venue was successfully deleted!')
+  # The page's delete button follows the redirect to the homepage
+  return jsonify({'success': True, 'redirect': url_for('main.index')})
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  venue={
+    "id": 1,
+    "name": "The Musical Hop",
+    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+    "address": "1015 Folsom Street",
+    "city": "San Francisco",
+    "state": "CA",
+    "phone": "123-123-1234",
+    "website": "https://www.themusicalhop.com",
+    "facebook_link": "https://www.facebook.com/TheMusicalHop",
+    "seeking_talent": True,
+    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+  }
+  # TODO: populate form with values from venue with ID <venue_id>
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  # TODO: take values from the form submitted, and update existing
+  # venue record with ID <venue_id> using the new attributes
+  return redirect(url_for('.show_venue', venue_id=venue_id))
@@ -0,0 +1,94 @@
+import time
+
+from flask import current_app
+
+from models import db, Venue, Artist, genre_cache
+from services import search_backend, suggest_index, page_path, template_names
+
+
+def compile_templates(app):
+    """Load every template of the app into the Jinja cache."""
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def load_lookups():
+    """Load the in-process lookups the request handlers would otherwise build
+    on first use: the genre cache, the suggest index and the search backend.
+    Also imports the modules the app only imports when first needed, such as
+    the forms with their state choices."""
+    import dateutil.parser  # noqa: F401
+    import formatting  # noqa: F401
+    import forms  # noqa: F401
+
+    genre_cache().ids()
+    suggest_index()
+    search_backend()
+
+
+def hot_paths(detail_pages):
+    """Return the listings, then the detail pages of the venues and artists
+    with the most upcoming shows, which are the pages most requested."""
+    paths = [page_path(endpoint) for endpoint in
+             ('main.index', 'venues.venues', 'artists.artists', 'shows.shows')]
+    for model, endpoint, argument in ((Venue, 'venues.show_venue', 'venue_id'),
+                                      (Artist, 'artists.show_artist', 'artist_id')):
+        rows = db.session.query(model.id) \
+            .order_by(model.upcoming_show_count.desc(), model.id).limit(detail_pages)
+        paths.extend(page_path(endpoint, **{argument: row.id}) for row in rows)
+    return paths
+
+
+def prime_pages(app, paths):
+    """Request each path once, which stores it in the page cache and its
+    {% cache %} blocks in the fragment cache. Returns how many succeeded."""
+    client = app.test_client()
+    primed = 0
+    for path in paths:
+        try:
+            response = client.get(path)
+        except Exception:
+            app.logger.exception('Warming up %s failed', path)
+            continue
+        if response.status_code == 200:
+            primed += 1
+        else:
+            app.logger.warning('Warming up %s returned %d', path, response.status_code)
+    return primed
+
+
+def warm_up(app=None):
+    """Warm up app before a pre-fork server forks its workers.
+
+    Compiles the templates, loads the lookups and renders the hottest pages
+    into the page and fragment caches, so workers start with all of it
+    already in memory and share it copy-on-write. With WARMUP_DETAIL_PAGES
+    at 0 only the listings are rendered.
+
+    Database connections opened here are closed before returning, as a
+    connection must never be shared by forked workers. Returns what was
+    warmed and how long it took.
+    """
+    app = app or current_app._get_current_object()
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            templates = compile_templates(app)
+            load_lookups()
+            paths = hot_paths(app.config['WARMUP_DETAIL_PAGES'])
+            pages = prime_pages(app, paths)
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+
+    summary = {
+        'templates': templates,
+        'pages': pages,
+        'page_cache': app.config['PAGE_CACHE_ENABLED'],
+        'fragment_cache': app.config['FRAGMENT_CACHE_ENABLED'],
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    app.logger.info('Warmed up %(templates)d templates and %(pages)d pages in %(seconds).2fs', summary)
+    return summary
@@ -0,0 +1,19 @@
+"""Entry point for pre-fork WSGI servers, e.g. gunicorn with gunicorn.conf.py.
+
+The app is built, and with WARMUP_ENABLED warmed up, once in the master
+process. Forked workers then start with the compiled templates, lookups and
+cached pages already in memory, shared copy-on-write.
+"""
+import gc
+
+from app import create_app
+from warmup import warm_up
+
+app = create_app()
+
+if app.config['WARMUP_ENABLED']:
+    warm_up(app)
+    # Move everything loaded so far out of the collector's reach, so that
+    # collections in the workers don't touch, and so copy, the shared pages
+    gc.collect()
+    gc.freeze()